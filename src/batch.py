@@ -0,0 +1,54 @@
+import multiprocessing
+import os
+
+# Model shared with forked workers; children inherit the parent's index
+# (dicts, arrays or the mmap) copy-on-write instead of receiving a pickle
+worker_model = None
+
+# Below this many queries per worker, forking a pool costs more than it saves
+MIN_QUERIES_PER_WORKER = 32
+
+
+def effective_workers(workers, num_queries):
+    # Worker processes retrieve_batch actually uses: never more than the
+    # CPUs (extra processes only time-slice) or than the batch can keep busy
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        workers = cpus
+    return max(1, min(workers, cpus, num_queries // MIN_QUERIES_PER_WORKER))
+
+
+def retrieve_chunk(chunk, method, top_k):
+    retrieve = getattr(worker_model, method)
+    return [(query_id, retrieve(query_text, top_k=top_k)) for query_id, query_text in chunk]
+
+
+def retrieve_batch(model, queries, top_k=100, workers=None, method='retrieve', chunks_per_worker=4):
+    # {query_id: results} for every query, in query order
+    global worker_model
+    
+    items = list(queries.items())
+    retrieve = getattr(model, method)
+    workers = effective_workers(workers, len(items))
+    
+    # A pool is forked per call so workers see the index as it is now
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return {query_id: retrieve(query_text, top_k=top_k) for query_id, query_text in items}
+    
+    # The first query runs here, so state the models build lazily (length
+    # norms, refreshed weights) exists once and is inherited by every worker
+    results = {items[0][0]: retrieve(items[0][1], top_k=top_k)}
+    
+    rest = items[1:]
+    chunk_size = max(1, -(-len(rest) // (workers * chunks_per_worker)))
+    chunks = [rest[start:start + chunk_size] for start in range(0, len(rest), chunk_size)]
+    
+    worker_model = model
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for chunk_results in pool.starmap(retrieve_chunk, [(chunk, method, top_k) for chunk in chunks]):
+                results.update(chunk_results)
+    finally:
+        worker_model = None
+    
+    return results
@@ -0,0 +1,338 @@
+import os
+import random
+import time
+
+from batch import effective_workers
+from data_processing import parse_cranfield_documents, read_cranfield_data
+from evaluation import (calculate_average_precision, calculate_err_at_k, calculate_f1_at_k,
+                        calculate_ndcg_at_k, calculate_precision_at_k, calculate_r_precision,
+                        calculate_recall_at_k, evaluate_query)
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from preprocessing import TextPreprocessor
+from query_cache import QueryCache
+from ranking import select_top_k
+from vsm import VectorSpaceModel
+
+
+def time_call(func, repeats=5):
+    # Best-of-N wall clock time in milliseconds
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark_top_k(collection_sizes=[1400, 10000, 100000], top_k_values=[10, 100, 1000], repeats=5):
+    """Compare full sort + slice against heap-based top-k selection."""
+    print("\n" + "=" * 70)
+    print("BENCHMARK: TOP-K SELECTION")
+    print("=" * 70)
+    
+    print(f"\n{'Docs':>10} {'top_k':>8} {'Full sort (ms)':>16} {'Heap (ms)':>12} {'Speedup':>9}")
+    print("-" * 70)
+    
+    rng = random.Random(42)
+    
+    for num_docs in collection_sizes:
+        # Scores with some ties, as produced by short queries
+        scores = {doc_id: round(rng.random(), 4) for doc_id in range(1, num_docs + 1)}
+        
+        for top_k in top_k_values:
+            full_sort = time_call(
+                lambda: sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_k], repeats
+            )
+            heap = time_call(lambda: select_top_k(scores, top_k), repeats)
+            
+            print(f"{num_docs:>10,} {top_k:>8} {full_sort:>16.2f} {heap:>12.2f} {full_sort / heap:>8.1f}x")
+    
+    print("=" * 70)
+
+
+def benchmark_index_memory(data_dir="data/cranfield"):
+    """Compare resident index size in full, lean and compressed lean mode."""
+    documents = parse_cranfield_documents(os.path.join(data_dir, 'cran.all.1400'))
+    preprocessor = TextPreprocessor()
+    
+    modes = [('Full', False, None), ('Lean', True, None), ('Lean+vbyte', True, 'vbyte')]
+    reports = {}
+    for mode, lean, compression in modes:
+        index = InvertedIndex(preprocessor, lean=lean, compression=compression)
+        index.build_index(documents)
+        reports[mode] = index.memory_report()
+    
+    print("\n" + "=" * 70)
+    print("BENCHMARK: INDEX MEMORY")
+    print("=" * 70)
+    
+    print(f"\n{'Structure (MB)':<26}" + "".join(f"{mode:>12}" for mode, _, _ in modes))
+    print("-" * 70)
+    for name in reports['Full']:
+        print(f"{name:<26}" + "".join(f"{reports[mode][name] / 1024 / 1024:>12.2f}"
+                                      for mode, _, _ in modes))
+    
+    for mode, _, _ in modes[1:]:
+        saving = 1 - reports[mode]['Total'] / reports['Full']['Total']
+        print(f"\n{mode} saves {saving * 100:.1f}% of index memory")
+    print("=" * 70)
+
+
+def benchmark_stem_cache(data_dir="data/cranfield", cache_sizes=[0, 1000, 10000, 50000], repeats=3):
+    """Preprocessing throughput with and without the stem cache."""
+    documents = parse_cranfield_documents(os.path.join(data_dir, 'cran.all.1400'))
+    
+    print("\n" + "=" * 70)
+    print("BENCHMARK: STEM CACHE")
+    print("=" * 70)
+    
+    print(f"\n{'Cache size':>10} {'Policy':>8} {'Time (ms)':>12} {'Hit rate':>10} {'Evictions':>12}")
+    print("-" * 70)
+    for cache_size in cache_sizes:
+        for policy in (['lru', 'fifo'] if cache_size > 0 else ['-']):
+            preprocessor = TextPreprocessor(stem_cache_size=cache_size,
+                                            stem_cache_policy=policy if cache_size > 0 else 'lru')
+            
+            def preprocess_all():
+                # Each repeat starts cold
+                if preprocessor.stem_cache is not None:
+                    preprocessor.stem_cache = type(preprocessor.stem_cache)(cache_size, policy)
+                for text in documents.values():
+                    preprocessor.preprocess(text)
+            
+            elapsed = time_call(preprocess_all, repeats)
+            cache = preprocessor.stem_cache
+            hit_rate = f"{cache.hit_rate() * 100:.1f}%" if cache else "-"
+            evictions = f"{cache.evictions:,}" if cache else "-"
+            print(f"{cache_size:>10,} {policy:>8} {elapsed:>12.1f} {hit_rate:>10} {evictions:>12}")
+    print("=" * 70)
+
+
+def benchmark_preprocessing(data_dir="data/cranfield", repeats=5):
+    """Tokens per second of the staged and the fused preprocessing pipeline."""
+    documents = list(parse_cranfield_documents(os.path.join(data_dir, 'cran.all.1400')).values())
+    
+    print("\n" + "=" * 70)
+    print("BENCHMARK: PREPROCESSING THROUGHPUT")
+    print("=" * 70)
+    
+    print(f"\n{'Configuration':<22} {'Staged (tok/s)':>16} {'Fused (tok/s)':>16} {'Speedup':>9}")
+    print("-" * 70)
+    for use_stemming, use_stopwords in [(True, True), (True, False), (False, True), (False, False)]:
+        preprocessor = TextPreprocessor(use_stemming=use_stemming, use_stopwords=use_stopwords)
+        
+        # Same tokens either way; the stem cache is warm for both
+        num_tokens = sum(len(preprocessor.preprocess_staged(text)) for text in documents)
+        if num_tokens != sum(len(preprocessor.preprocess(text)) for text in documents):
+            raise AssertionError("Fused pipeline produced a different token count")
+        
+        staged = time_call(lambda: [preprocessor.preprocess_staged(text) for text in documents], repeats)
+        fused = time_call(lambda: [preprocessor.preprocess(text) for text in documents], repeats)
+        
+        name = f"stem={'on' if use_stemming else 'off'}, stop={'on' if use_stopwords else 'off'}"
+        print(f"{name:<22} {num_tokens / staged * 1000:>16,.0f} {num_tokens / fused * 1000:>16,.0f} "
+              f"{staged / fused:>8.2f}x")
+    print("=" * 70)
+
+
+def benchmark_parallel_build(data_dir="data/cranfield", copies=10, worker_counts=None):
+    """Index build time by number of worker processes on a replicated collection."""
+    documents = parse_cranfield_documents(os.path.join(data_dir, 'cran.all.1400'))
+    
+    # Cranfield repeated under fresh doc ids, with a cold stem cache per copy
+    collection = {}
+    for copy in range(copies):
+        for doc_id, text in documents.items():
+            collection[copy * len(documents) + doc_id] = text
+    
+    if worker_counts is None:
+        worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    
+    timings = {}
+    for workers in worker_counts:
+        index = InvertedIndex(TextPreprocessor(), lean=True)
+        start = time.perf_counter()
+        index.build_index(collection, workers=workers)
+        timings[workers] = time.perf_counter() - start
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: PARALLEL INDEX BUILD ({len(collection):,} docs, {os.cpu_count()} CPUs)")
+    print("=" * 70)
+    
+    print(f"\n{'Workers':>8} {'Time (s)':>10} {'Speedup':>9}")
+    print("-" * 70)
+    for workers in worker_counts:
+        print(f"{workers:>8} {timings[workers]:>10.2f} {timings[worker_counts[0]] / timings[workers]:>8.2f}x")
+    print("=" * 70)
+
+
+def benchmark_batch_retrieval(data_dir="data/cranfield", worker_counts=None, repeats=3):
+    """Wall clock time of retrieve_batch over all queries by number of workers."""
+    queries, _, documents = read_cranfield_data(data_dir)
+    index = InvertedIndex(TextPreprocessor(), lean=True)
+    index.build_index(documents)
+    models = [('VSM', VectorSpaceModel(index)), ('Dirichlet LM', UnigramLanguageModel(index))]
+    
+    if worker_counts is None:
+        worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: BATCH RETRIEVAL ({len(queries)} queries, {os.cpu_count()} CPUs)")
+    print("=" * 70)
+    
+    # Requested workers are capped by effective_workers; speedup is measured
+    # against the in-process run and efficiency is speedup per process used
+    print(f"\n{'Model':<14} {'Workers':>8} {'Used':>6} {'Time (ms)':>12} {'Speedup':>9} {'Efficiency':>11}")
+    print("-" * 70)
+    for name, model in models:
+        baseline = time_call(lambda: model.retrieve_batch(queries, top_k=100, workers=1), repeats)
+        for workers in worker_counts:
+            used = effective_workers(workers, len(queries))
+            elapsed = time_call(lambda: model.retrieve_batch(queries, top_k=100, workers=workers), repeats)
+            speedup = baseline / elapsed
+            print(f"{name:<14} {workers:>8} {used:>6} {elapsed:>12.1f} {speedup:>8.2f}x {speedup / used:>10.0%}")
+    print("=" * 70)
+
+
+def zipf_query_log(queries, log_size, skew=1.1, seed=42):
+    # Head queries repeat, as in a real query log
+    query_texts = list(queries.values())
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(query_texts))]
+    return rng.choices(query_texts, weights=weights, k=log_size)
+
+
+def benchmark_query_cache(data_dir="data/cranfield", log_size=5000, cache_sizes=[0, 50, 200, 1000], skew=1.1, seed=42):
+    """Replay a Zipf-skewed query log through retrieve with result caches of several sizes."""
+    queries, _, documents = read_cranfield_data(data_dir)
+    index = InvertedIndex(TextPreprocessor(), lean=True)
+    index.build_index(documents)
+    
+    log = zipf_query_log(queries, log_size, skew, seed)
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: QUERY RESULT CACHE ({log_size:,} queries, Zipf s={skew})")
+    print("=" * 70)
+    
+    print(f"\n{'Model':<14} {'Cache':>8} {'Time (ms)':>12} {'Hit rate':>10} {'Speedup':>9}")
+    print("-" * 70)
+    for name, model_class in [('VSM', VectorSpaceModel), ('Dirichlet LM', UnigramLanguageModel)]:
+        baseline = None
+        for cache_size in cache_sizes:
+            cache = QueryCache(max_entries=cache_size)
+            model = model_class(index, result_cache=cache if cache_size > 0 else None)
+            
+            start = time.perf_counter()
+            for query_text in log:
+                model.retrieve(query_text, top_k=100)
+            elapsed = (time.perf_counter() - start) * 1000
+            
+            baseline = baseline or elapsed
+            print(f"{name:<14} {cache_size:>8} {elapsed:>12.1f} {cache.hit_rate() * 100:>9.1f}% "
+                  f"{baseline / elapsed:>8.2f}x")
+    print("=" * 70)
+
+
+def benchmark_postings_cache(data_dir="data/cranfield", log_size=2000, budgets_kb=[0, 64, 256, 16384], skew=1.1):
+    """Replay a Zipf-skewed query log over compressed postings with several postings cache budgets."""
+    queries, _, documents = read_cranfield_data(data_dir)
+    log = zipf_query_log(queries, log_size, skew)
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: POSTINGS CACHE ({log_size:,} queries, vbyte postings)")
+    print("=" * 70)
+    
+    rows = []
+    for budget in budgets_kb:
+        index = InvertedIndex(TextPreprocessor(), lean=True, compression='vbyte',
+                              postings_cache_bytes=budget * 1024)
+        index.build_index(documents)
+        model = UnigramLanguageModel(index)
+        
+        start = time.perf_counter()
+        for query_text in log:
+            model.retrieve(query_text, top_k=100)
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        hit_rate = index.postings_cache.hit_rate() if index.postings_cache is not None else 0.0
+        rows.append((budget, elapsed, hit_rate))
+    
+    print(f"\n{'Budget (KB)':>12} {'Time (ms)':>12} {'Hit rate':>10} {'Speedup':>9}")
+    print("-" * 70)
+    for budget, elapsed, hit_rate in rows:
+        print(f"{budget:>12,} {elapsed:>12.1f} {hit_rate * 100:>9.1f}% {rows[0][1] / elapsed:>8.2f}x")
+    print("=" * 70)
+
+
+def benchmark_evaluation(data_dir="data/cranfield", k_values=[1, 5, 10, 20, 50, 100], repeats=5):
+    """Per-metric evaluation functions against the single-pass evaluate_query."""
+    queries, relevances, documents = read_cranfield_data(data_dir)
+    index = InvertedIndex(TextPreprocessor(), lean=True)
+    index.build_index(documents)
+    results = VectorSpaceModel(index).retrieve_batch(queries, top_k=100, workers=1)
+    judged = [(relevances[query_id], results[query_id]) for query_id in queries if relevances.get(query_id)]
+    
+    def per_metric():
+        for relevant_docs, ranked_docs in judged:
+            for k in k_values:
+                calculate_precision_at_k(relevant_docs, ranked_docs, k)
+                calculate_recall_at_k(relevant_docs, ranked_docs, k)
+                calculate_f1_at_k(relevant_docs, ranked_docs, k)
+                calculate_ndcg_at_k(relevant_docs, ranked_docs, k)
+                calculate_err_at_k(relevant_docs, ranked_docs, k)
+            calculate_average_precision(relevant_docs, ranked_docs)
+            calculate_r_precision(relevant_docs, ranked_docs)
+    
+    def single_pass():
+        for relevant_docs, ranked_docs in judged:
+            evaluate_query(relevant_docs, ranked_docs, k_values)
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: EVALUATION ({len(judged)} queries, K={k_values})")
+    print("=" * 70)
+    
+    per_metric_ms = time_call(per_metric, repeats)
+    single_pass_ms = time_call(single_pass, repeats)
+    print(f"\n  Per-metric functions: {per_metric_ms:>10.1f} ms")
+    print(f"  Single pass:          {single_pass_ms:>10.1f} ms  ({per_metric_ms / single_pass_ms:.1f}x)")
+    print("=" * 70)
+
+
+def benchmark_mu_sweep(data_dir="data/cranfield", mu_values=[100, 250, 500, 1000, 1500, 2000, 3000, 5000]):
+    """Grid search over Dirichlet mu: one full retrieval run per value against one sweep."""
+    queries, relevances, documents = read_cranfield_data(data_dir)
+    index = InvertedIndex(TextPreprocessor(), lean=True)
+    index.build_index(documents)
+    model = UnigramLanguageModel(index)
+    
+    start = time.perf_counter()
+    for mu in mu_values:
+        model.mu = mu
+        model.retrieve_batch(queries, top_k=100, workers=1)
+    full_runs_ms = (time.perf_counter() - start) * 1000
+    model.mu = 2000
+    
+    start = time.perf_counter()
+    model.sweep_mu(queries, mu_values, top_k=100)
+    sweep_ms = (time.perf_counter() - start) * 1000
+    
+    print("\n" + "=" * 70)
+    print(f"BENCHMARK: DIRICHLET μ SWEEP ({len(mu_values)} values, {len(queries)} queries)")
+    print("=" * 70)
+    print(f"\n  Full run per μ:  {full_runs_ms:>10.1f} ms")
+    print(f"  Single sweep:    {sweep_ms:>10.1f} ms  ({full_runs_ms / sweep_ms:.1f}x)")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    benchmark_top_k()
+    benchmark_index_memory()
+    benchmark_stem_cache()
+    benchmark_preprocessing()
+    benchmark_parallel_build()
+    benchmark_batch_retrieval()
+    benchmark_query_cache()
+    benchmark_postings_cache()
+    benchmark_evaluation()
+    benchmark_mu_sweep()
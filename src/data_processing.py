@@ -1,7 +1,8 @@
 import os
 
-def parse_cranfield_documents(file_path):
-    documents = {}
+def iter_cranfield_documents(file_path):
+    # Yields (doc_id, text) one document at a time, so a collection can be
+    # indexed without holding all of its raw text in memory
     current_doc_id = None
     current_field = None
     current_text = []
@@ -12,9 +13,9 @@ def parse_cranfield_documents(file_path):
             
             # Document ID marker
             if line.startswith('.I'):
-                # Save previous document
+                # Emit previous document
                 if current_doc_id is not None:
-                    documents[current_doc_id] = ' '.join(current_text).strip()
+                    yield current_doc_id, ' '.join(current_text).strip()
                 
                 # Start new document
                 current_doc_id = int(line.split()[1])
@@ -36,11 +37,14 @@ def parse_cranfield_documents(file_path):
                 if line:  # Skip empty lines
                     current_text.append(line)
         
-        # Save last document
+        # Emit last document
         if current_doc_id is not None:
-            documents[current_doc_id] = ' '.join(current_text).strip()
+            yield current_doc_id, ' '.join(current_text).strip()
+
+
+def parse_cranfield_documents(file_path):
     
-    return documents
+    return dict(iter_cranfield_documents(file_path))
 
 
 def parse_cranfield_queries(file_path):
@@ -80,7 +84,15 @@ def parse_cranfield_queries(file_path):
     return queries
 
 
+# cranqrel grades run from 1 (complete answer) to 4 (minimal interest), with
+# -1 for judged but of no interest; stored as gains where higher is better
+CRANFIELD_GRADES = {1: 4, 2: 3, 3: 2, 4: 1, -1: 0}
+
+
 def parse_cranfield_relevance(file_path):
+    # {query_id: {doc_id: grade}} in file order. Binary metrics treat every
+    # judged document as relevant (the dict iterates and tests membership
+    # like a doc_id list); graded metrics use the grades.
     relevances = {}
     
     with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
@@ -89,12 +101,12 @@ def parse_cranfield_relevance(file_path):
             if len(parts) >= 2:
                 query_id = int(parts[0])
                 doc_id = int(parts[1])
-                # relevance_score = int(parts[2]) if len(parts) >= 3 else 1
+                grade = CRANFIELD_GRADES.get(int(parts[2]), 0) if len(parts) >= 3 else 1
                 
                 # Add document to relevant list for this query
                 if query_id not in relevances:
-                    relevances[query_id] = []
-                relevances[query_id].append(doc_id)
+                    relevances[query_id] = {}
+                relevances[query_id][doc_id] = grade
     
     return relevances
 
@@ -56,11 +56,22 @@ def calculate_average_precision(relevant_docs, ranked_docs):
     return score / num_relevant if num_relevant > 0 else 0.0
 
 
-def calculate_dcg_at_k(relevant_docs, ranked_docs, k):
-    
+def graded_gain(grade):
+    # Exponential gain: each grade is worth about twice the one below
+    return 2 ** grade - 1
+
+
+def calculate_dcg_at_k(relevant_docs, ranked_docs, k, graded=False):
+    # graded=True needs {doc_id: grade} judgments
     if not ranked_docs or k == 0:
         return 0.0
     
+    if graded:
+        dcg = 0.0
+        for i, (doc_id, _) in enumerate(ranked_docs[:k], 1):
+            dcg += graded_gain(relevant_docs.get(doc_id, 0)) / math.log2(i + 1)
+        return dcg
+    
     relevant_set = set(relevant_docs)
     dcg = 0.0
     
@@ -72,25 +83,67 @@ def calculate_dcg_at_k(relevant_docs, ranked_docs, k):
     return dcg
 
 
-def calculate_idcg_at_k(relevant_docs, k):
-  
+# Ideal DCG prefix sums: IDCG_PREFIX[n] = sum_{i=1..n} 1 / log2(i + 1)
+IDCG_PREFIX = [0.0]
+
+# Graded ERR's default max_grade: the top of a 0-4 gain scale, as the
+# cranqrel grades are stored. Pass max_grade for other scales.
+MAX_GRADE = 4
+
+
+def ideal_dcg(num_relevant):
+    # Binary-relevance IDCG of the first num_relevant positions, summed in
+    # the same order as a ranking loop and cached across queries
+    while len(IDCG_PREFIX) <= num_relevant:
+        i = len(IDCG_PREFIX)
+        IDCG_PREFIX.append(IDCG_PREFIX[-1] + 1.0 / math.log2(i + 1))
+    return IDCG_PREFIX[num_relevant]
+
+
+def graded_ideal_dcg_prefix(relevant_docs):
+    # [IDCG@0, IDCG@1, ...] for {doc_id: grade}
+    prefix = [0.0]
+    for i, grade in enumerate(sorted(relevant_docs.values(), reverse=True), 1):
+        prefix.append(prefix[-1] + graded_gain(grade) / math.log2(i + 1))
+    return prefix
+
+
+def graded_ideal_dcg_prefixes(relevances):
+    # {query_id: ideal prefix}, built once per set of judgments so repeated
+    # compute_metrics calls (e.g. a parameter sweep) do not redo the sorting
+    return {query_id: graded_ideal_dcg_prefix(judgments) for query_id, judgments in relevances.items()}
+
+
+def resolve_max_grade(relevances, max_grade=None):
+    # Top grade of the scale for graded ERR (default: MAX_GRADE).
+    # A judged grade above it would give a stopping probability above 1.
+    if max_grade is None:
+        max_grade = MAX_GRADE
+    highest = max((grade for judgments in relevances.values() for grade in judgments.values()), default=0)
+    if highest > max_grade:
+        raise ValueError(f"Judged grade {highest} exceeds max_grade {max_grade}")
+    return max_grade
+
+
+def calculate_idcg_at_k(relevant_docs, k, graded=False, ideal_prefix=None):
+    # ideal_prefix: graded_ideal_dcg_prefix(relevant_docs), computed once per
+    # query by callers that ask for several cutoffs
     if not relevant_docs:
         return 0.0
     
-    # For binary relevance, ideal ranking has all relevant docs first
-    num_relevant = min(len(relevant_docs), k)
-    idcg = 0.0
-    
-    for i in range(1, num_relevant + 1):
-        idcg += 1.0 / math.log2(i + 1)
+    if graded:
+        if ideal_prefix is None:
+            ideal_prefix = graded_ideal_dcg_prefix(relevant_docs)
+        return ideal_prefix[min(len(ideal_prefix) - 1, k)]
     
-    return idcg
+    # For binary relevance, ideal ranking has all relevant docs first
+    return ideal_dcg(min(len(relevant_docs), k))
 
 
-def calculate_ndcg_at_k(relevant_docs, ranked_docs, k):
+def calculate_ndcg_at_k(relevant_docs, ranked_docs, k, graded=False, ideal_prefix=None):
   
-    dcg = calculate_dcg_at_k(relevant_docs, ranked_docs, k)
-    idcg = calculate_idcg_at_k(relevant_docs, k)
+    dcg = calculate_dcg_at_k(relevant_docs, ranked_docs, k, graded)
+    idcg = calculate_idcg_at_k(relevant_docs, k, graded, ideal_prefix)
     
     if idcg == 0:
         return 0.0
@@ -121,8 +174,14 @@ def calculate_r_precision(relevant_docs, ranked_docs):
     return calculate_precision_at_k(relevant_docs, ranked_docs, r)
 
 
-def calculate_err_at_k(relevant_docs, ranked_docs, k, max_grade=1):
-  
+def calculate_err_at_k(relevant_docs, ranked_docs, k, max_grade=None, graded=False):
+    # graded=True needs {doc_id: grade} judgments; max_grade is the top grade
+    # of their scale (default: MAX_GRADE)
+    if graded:
+        max_grade = resolve_max_grade({None: relevant_docs}, max_grade)
+    elif max_grade is None:
+        max_grade = 1
+    
     if not ranked_docs or k == 0:
         return 0.0
     
@@ -131,12 +190,16 @@ def calculate_err_at_k(relevant_docs, ranked_docs, k, max_grade=1):
     p = 1.0  # Probability user hasn't found a relevant doc yet
     
     for i, (doc_id, _) in enumerate(ranked_docs[:k], 1):
-        # Binary relevance: 1 if relevant, 0 otherwise
-        grade = 1 if doc_id in relevant_set else 0
-        
-        # Relevance probability (utility)
-        # For binary: R = grade / max_grade
-        r = grade / max_grade
+        if graded:
+            # Graded: R = (2^grade - 1) / 2^max_grade
+            r = graded_gain(relevant_docs.get(doc_id, 0)) / 2 ** max_grade
+        else:
+            # Binary relevance: 1 if relevant, 0 otherwise
+            grade = 1 if doc_id in relevant_set else 0
+            
+            # Relevance probability (utility)
+            # For binary: R = grade / max_grade
+            r = grade / max_grade
         
         # Contribution of this position
         err += p * r / i
@@ -183,11 +246,99 @@ def calculate_mrr(queries, relevances, results):
     return sum(reciprocal_ranks) / len(reciprocal_ranks)
 
 
-def evaluate_model(model_name, queries, relevances, results, k_values=[5, 10]):
+def evaluate_query(relevant_docs, ranked_docs, k_values, graded=False, max_grade=None, ideal_prefix=None):
+    # Every per-query metric from one scan of the ranking: the ranking becomes
+    # a relevance vector once and each cutoff reads the running hit count,
+    # DCG and ERR, so nothing is rescanned per k. Values are identical to
+    # the calculate_* functions above. graded=True switches nDCG and ERR to
+    # the {doc_id: grade} judgments; the other metrics stay binary.
+    # ideal_prefix: graded_ideal_dcg_prefix(relevant_docs), if already known.
+    if graded:
+        max_grade = resolve_max_grade({None: relevant_docs}, max_grade)
+    elif max_grade is None:
+        max_grade = 1
+    
+    relevant_set = set(relevant_docs)
+    num_relevant = len(relevant_docs)
+    relevance = [1 if doc_id in relevant_set else 0 for doc_id, _ in ranked_docs]
+    
+    if graded:
+        gains = [graded_gain(relevant_docs.get(doc_id, 0)) for doc_id, _ in ranked_docs]
+        max_gain = 2 ** max_grade  # ERR stopping probability R = gain / 2^max_grade
+    else:
+        gains = relevance
+        max_gain = max_grade
+    
+    cutoffs = set(k_values)
+    cutoffs.add(num_relevant)
+    
+    hits = 0
+    dcg = 0.0
+    err = 0.0
+    p = 1.0  # Probability user hasn't found a relevant doc yet
+    ap_sum = 0.0
+    at_cutoff = {0: (0, 0.0, 0.0)}  # {k: (hits, DCG, ERR) over the top k}
+    
+    for i, (rel, gain) in enumerate(zip(relevance, gains), 1):
+        if rel:
+            hits += 1
+            ap_sum += hits / i
+        if gain:
+            dcg += gain / math.log2(i + 1)
+            r = gain / max_gain
+            err += p * r / i
+            p *= (1 - r)
+        if i in cutoffs:
+            at_cutoff[i] = (hits, dcg, err)
+    
+    # Cutoffs past the end of the ranking see the whole ranking
+    for k in cutoffs:
+        if k not in at_cutoff:
+            at_cutoff[k] = (hits, dcg, err)
+    
+    def precision(k):
+        if not ranked_docs or k == 0:
+            return 0.0
+        return at_cutoff[k][0] / k
+    
+    if graded and ideal_prefix is None:
+        ideal_prefix = graded_ideal_dcg_prefix(relevant_docs)
+    
+    metrics = {'precision_at_k': {}, 'recall_at_k': {}, 'f1_at_k': {}, 'ndcg_at_k': {}, 'err_at_k': {}}
+    for k in k_values:
+        hits_k, dcg_k, err_k = at_cutoff[k]
+        precision_k = precision(k)
+        recall_k = hits_k / num_relevant if num_relevant else 0.0
+        if graded:
+            idcg_k = ideal_prefix[min(len(ideal_prefix) - 1, k)]
+        else:
+            idcg_k = ideal_dcg(min(num_relevant, k))
+        
+        metrics['precision_at_k'][k] = precision_k
+        metrics['recall_at_k'][k] = recall_k
+        metrics['f1_at_k'][k] = (2 * (precision_k * recall_k) / (precision_k + recall_k)
+                                 if precision_k + recall_k != 0 else 0.0)
+        metrics['ndcg_at_k'][k] = dcg_k / idcg_k if ranked_docs and k and idcg_k != 0 else 0.0
+        metrics['err_at_k'][k] = err_k if ranked_docs and k else 0.0
+    
+    metrics['average_precision'] = ap_sum / num_relevant if num_relevant > 0 else 0.0
+    metrics['r_precision'] = precision(num_relevant) if num_relevant else 0.0
+    return metrics
 
-    print("\n" + "=" * 70)
-    print(f"EVALUATING: {model_name}")
-    print("=" * 70)
+
+def compute_metrics(queries, relevances, results, k_values=[5, 10], graded=False, max_grade=None,
+                    ideal_prefixes=None):
+    # evaluate_model without the report, for callers that evaluate many runs.
+    # graded=True: nDCG@k and ERR@k from {doc_id: grade} judgments, with ERR
+    # normalized by max_grade (default: MAX_GRADE).
+    # ideal_prefixes: graded_ideal_dcg_prefixes(relevances), for callers
+    # that evaluate many runs against the same judgments.
+    if graded:
+        max_grade = resolve_max_grade(relevances, max_grade)
+        if ideal_prefixes is None:
+            ideal_prefixes = graded_ideal_dcg_prefixes(relevances)
+    else:
+        max_grade = 1
     
     metrics = {
         'precision_at_k': {k: [] for k in k_values},
@@ -210,31 +361,16 @@ def evaluate_model(model_name, queries, relevances, results, k_values=[5, 10]):
         
         num_queries_evaluated += 1
         
-        # Calculate all metrics at different K values
-        for k in k_values:
-            metrics['precision_at_k'][k].append(
-                calculate_precision_at_k(relevant_docs, ranked_docs, k)
-            )
-            metrics['recall_at_k'][k].append(
-                calculate_recall_at_k(relevant_docs, ranked_docs, k)
-            )
-            metrics['f1_at_k'][k].append(
-                calculate_f1_at_k(relevant_docs, ranked_docs, k)
-            )
-            metrics['ndcg_at_k'][k].append(
-                calculate_ndcg_at_k(relevant_docs, ranked_docs, k)
-            )
-            metrics['err_at_k'][k].append(
-                calculate_err_at_k(relevant_docs, ranked_docs, k)
-            )
+        # All metrics at all K values from a single pass over the ranking
+        ideal_prefix = ideal_prefixes[query_id] if graded else None
+        query_metrics = evaluate_query(relevant_docs, ranked_docs, k_values, graded, max_grade, ideal_prefix)
+        for name in ('precision_at_k', 'recall_at_k', 'f1_at_k', 'ndcg_at_k', 'err_at_k'):
+            for k in k_values:
+                metrics[name][k].append(query_metrics[name][k])
         
         # Single-value metrics
-        metrics['average_precisions'].append(
-            calculate_average_precision(relevant_docs, ranked_docs)
-        )
-        metrics['r_precisions'].append(
-            calculate_r_precision(relevant_docs, ranked_docs)
-        )
+        metrics['average_precisions'].append(query_metrics['average_precision'])
+        metrics['r_precisions'].append(query_metrics['r_precision'])
     
     # Aggregate metrics
     aggregated = {
@@ -249,6 +385,23 @@ def evaluate_model(model_name, queries, relevances, results, k_values=[5, 10]):
         aggregated[f'nDCG@{k}'] = sum(metrics['ndcg_at_k'][k]) / len(metrics['ndcg_at_k'][k])
         aggregated[f'ERR@{k}'] = sum(metrics['err_at_k'][k]) / len(metrics['err_at_k'][k])
     
+    return {
+        'raw_metrics': metrics,
+        'aggregated': aggregated,
+        'num_queries': num_queries_evaluated
+    }
+
+
+def evaluate_model(model_name, queries, relevances, results, k_values=[5, 10], graded=False, max_grade=None):
+
+    print("\n" + "=" * 70)
+    print(f"EVALUATING: {model_name}" + (" (graded nDCG/ERR)" if graded else ""))
+    print("=" * 70)
+    
+    evaluation = compute_metrics(queries, relevances, results, k_values, graded, max_grade)
+    aggregated = evaluation['aggregated']
+    num_queries_evaluated = evaluation['num_queries']
+    
     # Print results
     print(f"\nResults ({num_queries_evaluated} queries evaluated):")
     print(f"\n  Core Metrics:")
@@ -265,8 +418,4 @@ def evaluate_model(model_name, queries, relevances, results, k_values=[5, 10]):
     
     print("=" * 70)
     
-    return {
-        'raw_metrics': metrics,
-        'aggregated': aggregated,
-        'num_queries': num_queries_evaluated
-    }
\ No newline at end of file
+    return evaluation
\ No newline at end of file
@@ -0,0 +1,203 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+from postings import PostingsList
+
+# File layout (little-endian):
+#   header      magic + (offset, size) of the postings, document and dictionary sections
+#   postings    per term: weights float64[df], doc_ids uint32[df], freqs uint32[df]
+#   documents   doc_norms float64[N], doc_ids uint32[N], doc_lengths uint32[N]
+#   dictionary  UTF-8 JSON: collection statistics and {term: [offset, df, ...]}
+MAGIC = b'IRIDX001'
+HEADER = struct.Struct('<8sQQQQQQ')
+
+# Positions of the per-term fields in the dictionary entries
+TERM_OFFSET, TERM_DF, TERM_COUNT, TERM_IDF, TERM_MAX_TF, TERM_MAX_WEIGHT = range(6)
+
+
+def to_disk_bytes(values):
+    # Arrays are stored little-endian regardless of the host
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class IndexWriter:
+    """Streams an index to disk term by term, then documents and dictionary."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(b'\0' * HEADER.size)
+        self.terms = {}
+        self.postings_start = HEADER.size
+    
+    def add_term(self, term, doc_ids, freqs, weights, collection_count, idf, max_tf, max_weight):
+        offset = self.file.tell() - self.postings_start
+        self.file.write(to_disk_bytes(array('d', weights)))
+        self.file.write(to_disk_bytes(array('I', doc_ids)))
+        self.file.write(to_disk_bytes(array('I', freqs)))
+        self.terms[term] = [offset, len(doc_ids), collection_count, idf, max_tf, max_weight]
+    
+    def iter_written_terms(self):
+        # Read back (term, doc_ids, weights) in write order, e.g. to fill in
+        # statistics that are only known once every term has been written
+        self.file.flush()
+        with open(self.path, 'rb') as f:
+            for term, entry in self.terms.items():
+                df = entry[TERM_DF]
+                f.seek(self.postings_start + entry[TERM_OFFSET])
+                weights = array('d')
+                weights.frombytes(f.read(8 * df))
+                doc_ids = array('I')
+                doc_ids.frombytes(f.read(4 * df))
+                if sys.byteorder == 'big':
+                    weights.byteswap()
+                    doc_ids.byteswap()
+                yield term, doc_ids, weights
+    
+    def finish(self, doc_ids, doc_lengths, doc_norms, metadata):
+        postings_size = self.file.tell() - self.postings_start
+        
+        documents_start = self.file.tell()
+        self.file.write(to_disk_bytes(array('d', doc_norms)))
+        self.file.write(to_disk_bytes(array('I', doc_ids)))
+        self.file.write(to_disk_bytes(array('I', doc_lengths)))
+        documents_size = self.file.tell() - documents_start
+        
+        dictionary_start = self.file.tell()
+        dictionary = dict(metadata, num_docs=len(doc_ids), terms=self.terms)
+        self.file.write(json.dumps(dictionary).encode('utf-8'))
+        dictionary_size = self.file.tell() - dictionary_start
+        
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.postings_start, postings_size,
+                                    documents_start, documents_size,
+                                    dictionary_start, dictionary_size))
+        self.close()
+    
+    def close(self):
+        # Safe to call again; a writer closed before finish() leaves an incomplete file
+        if not self.file.closed:
+            self.file.close()
+
+
+def write_index(index, path, metadata):
+    writer = IndexWriter(path)
+    
+    for term in sorted(index.index.keys()):
+        postings = index.get_postings(term)
+        writer.add_term(
+            term,
+            postings.doc_ids,
+            postings.freqs,
+            index.get_tfidf_weights(term),
+            index.get_collection_term_count(term),
+            index.get_idf(term),
+            index.get_max_term_freq(term),
+            index.get_max_normalized_weight(term)
+        )
+    
+    doc_ids = sorted(index.doc_lengths.keys())
+    writer.finish(
+        doc_ids,
+        [index.doc_lengths[doc_id] for doc_id in doc_ids],
+        [index.doc_norms.get(doc_id, 0.0) for doc_id in doc_ids],
+        metadata
+    )
+
+
+class MappedIndexFile:
+    """Read-only view of an index file through mmap; postings stay on disk."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        
+        (magic, self.postings_start, _, documents_start, documents_size,
+         dictionary_start, dictionary_size) = HEADER.unpack_from(self.mm, 0)
+        
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not an index file: {path}")
+        
+        self.dictionary = json.loads(
+            bytes(self.view[dictionary_start:dictionary_start + dictionary_size]).decode('utf-8')
+        )
+        self.terms = self.dictionary.pop('terms')
+        
+        num_docs = self.dictionary['num_docs']
+        self.doc_norms = self.read_array('d', documents_start, num_docs)
+        self.doc_ids = self.read_array('I', documents_start + 8 * num_docs, num_docs)
+        self.doc_lengths = self.read_array('I', documents_start + 12 * num_docs, num_docs)
+    
+    def read_array(self, typecode, start, count):
+        # Zero-copy on little-endian hosts; a decoded copy otherwise
+        size = array(typecode).itemsize * count
+        values = self.view[start:start + size].cast(typecode)
+        if sys.byteorder == 'big':
+            values = array(typecode, values)
+            values.byteswap()
+        return values
+    
+    def term_arrays(self, term):
+        entry = self.terms[term]
+        df = entry[TERM_DF]
+        start = self.postings_start + entry[TERM_OFFSET]
+        
+        weights = self.read_array('d', start, df)
+        doc_ids = self.read_array('I', start + 8 * df, df)
+        freqs = self.read_array('I', start + 12 * df, df)
+        
+        return doc_ids, freqs, weights
+    
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        try:
+            self.mm.close()
+        except BufferError:
+            # Views handed out to callers are still alive; the mapping is
+            # released once they are garbage collected
+            pass
+        self.file.close()
+
+
+class MappedPostings(Mapping):
+    """{term: PostingsList} as zero-copy views into the mapped file."""
+    
+    def __init__(self, mapped_file):
+        self.mapped_file = mapped_file
+    
+    def __getitem__(self, term):
+        if term not in self.mapped_file.terms:
+            raise KeyError(term)
+        doc_ids, freqs, _ = self.mapped_file.term_arrays(term)
+        return PostingsList(doc_ids, freqs)
+    
+    def __contains__(self, term):
+        return term in self.mapped_file.terms
+    
+    def __iter__(self):
+        return iter(self.mapped_file.terms)
+    
+    def __len__(self):
+        return len(self.mapped_file.terms)
+
+
+class MappedWeights(MappedPostings):
+    """{term: TF-IDF weights} as zero-copy views into the mapped file."""
+    
+    def __getitem__(self, term):
+        if term not in self.mapped_file.terms:
+            raise KeyError(term)
+        _, _, weights = self.mapped_file.term_arrays(term)
+        return weights
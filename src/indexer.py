@@ -1,23 +1,102 @@
+import bisect
 import math
-from collections import Counter, defaultdict
+import os
+import sys
+import uuid
+from array import array
+from collections import Counter, defaultdict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+from index_storage import (MappedIndexFile, MappedPostings, MappedWeights, write_index,
+                           TERM_COUNT, TERM_DF, TERM_IDF, TERM_MAX_TF, TERM_MAX_WEIGHT)
+from postings import CompressedPostingsList, PostingsCache, PostingsList
+
+
+def deep_sizeof(obj, seen):
+    # Approximate resident size of a structure, counting shared objects once
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, PostingsList):
+        size += deep_sizeof(obj.doc_ids, seen) + deep_sizeof(obj.freqs, seen)
+    elif isinstance(obj, CompressedPostingsList):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in
+                    ('data', 'block_last_doc', 'block_offsets', 'block_max_freq', 'block_max_weight'))
+    return size
+
+
+# Preprocessor of a parallel build worker; set once per process so its stem
+# cache stays warm across shards
+worker_preprocessor = None
+
+
+def init_worker(preprocessor):
+    global worker_preprocessor
+    worker_preprocessor = preprocessor
+
+
+def index_shard(shard, keep_term_counts):
+    # Worker side of the parallel build: preprocess one contiguous slice of
+    # the collection and return its partial index in document order
+    preprocessor = worker_preprocessor
+    postings = {}
+    doc_lengths = []
+    collection_term_counts = Counter()
+    doc_term_counts = [] if keep_term_counts else None
+    
+    for doc_id, text in shard:
+        term_counts = Counter(preprocessor.preprocess(text))
+        doc_lengths.append((doc_id, sum(term_counts.values())))
+        collection_term_counts.update(term_counts)
+        if keep_term_counts:
+            doc_term_counts.append((doc_id, term_counts))
+        
+        for term, count in term_counts.items():
+            term_postings = postings.get(term)
+            if term_postings is None:
+                term_postings = postings[term] = PostingsList()
+            term_postings.append(doc_id, count)
+    
+    return postings, doc_lengths, collection_term_counts, doc_term_counts
 
 
 class InvertedIndex:    
-    def __init__(self, preprocessor):
+    def __init__(self, preprocessor, lean=False, forward_index=False, compression=None,
+                 postings_cache_bytes=16 * 1024 * 1024):
         self.preprocessor = preprocessor
         
+        # Lean mode keeps no raw text and no per-document Counters
+        self.lean = lean
+        
+        # 'vbyte': block-max compressed postings for lists of at least one
+        # block, TF-IDF weights derived on the fly
+        if compression not in (None, 'vbyte'):
+            raise ValueError(f"Unknown postings compression: {compression}")
+        self.compression = compression
+        
         # Core index structure
-        self.index = defaultdict(list)  # term → [(doc_id, freq), ...]
+        self.index = defaultdict(PostingsList)  # term → PostingsList of (doc_id, freq)
         
         # Document statistics
-        self.documents = {}  # {doc_id: document_text}
-        self.doc_term_counts = {}  # {doc_id: {term: count}}
+        self.documents = {}  # {doc_id: document_text} (not kept in lean mode)
+        self.doc_term_counts = {}  # {doc_id: {term: count}} (not kept in lean mode)
         self.doc_lengths = {}  # {doc_id: total number of terms}
         
+        # Optional compact forward index, for features that need a document's terms
+        self.forward_index = {} if forward_index else None  # {doc_id: (term_ids, counts)}
+        self.term_ids = {}  # {term: term_id} (forward index only)
+        self.terms = []  # [term] indexed by term_id (forward index only)
+        
         # Collection statistics
         self.doc_freq = {}  # {term: number of docs containing term}
         self.idf = {}  # {term: IDF value}
-        self.vocabulary = set()  # All unique terms
         self.num_docs = 0
         self.total_terms = 0  # Total terms in collection
         self.avg_doc_length = 0.0
@@ -25,44 +104,68 @@ class InvertedIndex:
         # Collection-wide term counts (for language models)
         self.collection_term_counts = Counter()  # {term: total count in collection}
         
+        # Precomputed vector space weights (for VSM)
+        self.tfidf_weights = {}  # {term: array('d') aligned with postings}
+        self.doc_norms = {}  # {doc_id: L2 norm of TF-IDF vector}
+        
+        # Per-term score upper bounds (for dynamic pruning)
+        self.max_term_freqs = {}  # {term: highest count in any document}
+        self.max_normalized_weights = {}  # {term: highest TF-IDF weight / doc norm}
+        
+        # Open index file when loaded from disk (postings stay memory-mapped)
+        self.mapped_file = None
+        
+        # Incremental updates: deleted documents stay in postings as
+        # tombstones until the next compaction
+        self.deleted = set()  # tombstoned doc_ids
+        self.dirty_terms = set()  # terms whose postings contain tombstones
+        self.compact_ratio = 0.2  # compact once this fraction of documents is deleted
+        self.weights_stale = False  # TF-IDF weights, norms and bounds need recomputing
+        self.version = 0  # bumped on every add/delete, for caches built on the index
+        self.index_id = uuid.uuid4().hex  # tells indexes apart in a shared cache
+        
+        # Decoded postings of hot terms, for compressed or memory-mapped postings
+        self.postings_cache = PostingsCache(postings_cache_bytes) if postings_cache_bytes > 0 else None
+        self.postings_cache_version = 0
+        
         print("Inverted Index initialized")
     
-    def build_index(self, documents):
+    def build_index(self, documents, workers=1, shard_size=1000, mp_context=None):
+        # documents: {doc_id: text} or any iterable of (doc_id, text), e.g.
+        # iter_cranfield_documents, which is consumed once as a stream
         print("\n" + "=" * 70)
         print("BUILDING INVERTED INDEX")
         print("=" * 70)
         
-        self.documents = documents
-        self.num_docs = len(documents)
+        if isinstance(documents, dict):
+            if not self.lean:
+                # A copy, so later adds and deletes never touch the caller's dict
+                self.documents = dict(documents)
+            documents = documents.items()
+        elif not self.lean:
+            # Full mode keeps the raw text, so collect it while streaming
+            documents = self.keep_documents(documents)
 
-        print("\nStep 1: Processing documents and building index...")
-        
-        for doc_id, text in documents.items():
-            # Preprocess document
-            tokens = self.preprocessor.preprocess(text)
+        if workers > 1:
+            print(f"\nStep 1: Processing documents in parallel ({workers} workers)...")
             
-            # Count term frequencies in this document
-            term_counts = Counter(tokens)
-            self.doc_term_counts[doc_id] = term_counts
+            self.build_parallel(documents, workers, shard_size, mp_context)
+        else:
+            print("\nStep 1: Processing documents and building index...")
             
-            # Document length
-            doc_length = len(tokens)
-            self.doc_lengths[doc_id] = doc_length
-            self.total_terms += doc_length
-            
-            # Update vocabulary
-            self.vocabulary.update(tokens)
-            
-            # Update collection term counts (for language models)
-            self.collection_term_counts.update(tokens)
-            
-            # Build inverted index
-            for term, count in term_counts.items():
-                self.index[term].append((doc_id, count))
+            for doc_id, text in documents:
+                # Preprocess document
+                tokens = self.preprocessor.preprocess(text)
+                self.index_document(doc_id, tokens)
+        
+        self.num_docs = len(self.doc_lengths)
         
         print("Step 2: Computing document frequencies...")
         
         for term, postings in self.index.items():
+            # Keep postings in doc_id order (required for skipping)
+            postings.sort()
+            
             # Document frequency = number of documents containing this term
             self.doc_freq[term] = len(postings)
 
@@ -74,6 +177,19 @@ class InvertedIndex:
         
         self.compute_idf()
 
+        print("Step 5: Computing TF-IDF weights and document norms...")
+        
+        self.compute_vector_weights()
+
+        print("Step 6: Computing per-term score upper bounds...")
+        
+        self.compute_score_bounds()
+
+        if self.compression:
+            print("Step 7: Compressing postings...")
+            
+            self.compress_postings()
+
         print("\n✓ Index built successfully!")
         print(f"\nIndex Statistics:")
         print(f"  Documents indexed:        {self.num_docs:,}")
@@ -93,6 +209,92 @@ class InvertedIndex:
         
         print("=" * 70)
     
+    def index_document(self, doc_id, tokens):
+        # Count term frequencies in this document
+        term_counts = Counter(tokens)
+        if not self.lean:
+            self.doc_term_counts[doc_id] = term_counts
+        if self.forward_index is not None:
+            self.add_forward_entry(doc_id, term_counts)
+        
+        # Document length
+        doc_length = len(tokens)
+        self.doc_lengths[doc_id] = doc_length
+        self.total_terms += doc_length
+        
+        # Update collection term counts (for language models)
+        self.collection_term_counts.update(term_counts)
+        
+        # Build inverted index
+        for term, count in term_counts.items():
+            self.index[term].append(doc_id, count)
+    
+    def keep_documents(self, documents):
+        for doc_id, text in documents:
+            self.documents[doc_id] = text
+            yield doc_id, text
+    
+    def build_parallel(self, documents, workers, shard_size, mp_context=None):
+        # Contiguous shards, merged in submission order: terms, postings and
+        # counts end up in the same order as a sequential build, so every
+        # floating-point statistic is bit-identical
+        documents = iter(documents)
+        keep_term_counts = not self.lean or self.forward_index is not None
+        
+        # The preprocessor is pickled for workers under spawn/forkserver
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=init_worker,
+                                 initargs=(self.preprocessor,)) as executor:
+            # At most two shards per worker in flight, so raw text read ahead
+            # of the merge stays bounded for streamed collections
+            pending = deque()
+            while True:
+                shard = list(islice(documents, shard_size))
+                if shard:
+                    pending.append(executor.submit(index_shard, shard, keep_term_counts))
+                if pending and (not shard or len(pending) >= 2 * workers):
+                    self.merge_shard(*pending.popleft().result())
+                elif not shard:
+                    break
+    
+    def merge_shard(self, postings, doc_lengths, collection_term_counts, doc_term_counts):
+        for doc_id, doc_length in doc_lengths:
+            self.doc_lengths[doc_id] = doc_length
+            self.total_terms += doc_length
+        
+        self.collection_term_counts.update(collection_term_counts)
+        
+        if doc_term_counts is not None:
+            for doc_id, term_counts in doc_term_counts:
+                if not self.lean:
+                    self.doc_term_counts[doc_id] = term_counts
+                if self.forward_index is not None:
+                    self.add_forward_entry(doc_id, term_counts)
+        
+        for term, shard_postings in postings.items():
+            term_postings = self.index[term]
+            term_postings.doc_ids.extend(shard_postings.doc_ids)
+            term_postings.freqs.extend(shard_postings.freqs)
+    
+    def add_forward_entry(self, doc_id, term_counts):
+        # Store the document's terms as sorted term ids with parallel counts
+        entries = []
+        for term, count in term_counts.items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = len(self.terms)
+                self.term_ids[term] = term_id
+                self.terms.append(term)
+            entries.append((term_id, count))
+        
+        entries.sort()
+        self.forward_index[doc_id] = (array('I', [term_id for term_id, _ in entries]),
+                                      array('I', [count for _, count in entries]))
+    
+    @property
+    def vocabulary(self):
+        # Vocabulary membership comes straight from the term dictionary
+        return self.index.keys()
+    
     def compute_idf(self):
         for term, df in self.doc_freq.items():
             if df > 0:
@@ -101,9 +303,306 @@ class InvertedIndex:
             else:
                 self.idf[term] = 0.0
     
+    def compute_vector_weights(self):
+        self.tfidf_weights = {}
+        squared_norms = defaultdict(float)
+        
+        for term, postings in self.index.items():
+            idf = self.idf.get(term, 0.0)
+            
+            # One TF-IDF weight per posting, stored in postings order
+            weights = array('d', [(freq / self.doc_lengths[doc_id]) * idf
+                                  for doc_id, freq in postings])
+            self.tfidf_weights[term] = weights
+            
+            for (doc_id, _), weight in zip(postings, weights):
+                squared_norms[doc_id] += weight ** 2
+        
+        self.doc_norms = {doc_id: math.sqrt(squared_norms.get(doc_id, 0.0))
+                          for doc_id in self.doc_lengths}
+    
+    def compute_score_bounds(self):
+        self.max_term_freqs = {}
+        self.max_normalized_weights = {}
+        
+        for term, postings in self.index.items():
+            # Dirichlet: a term's matched contribution log(1 + c/(mu*P(t|C)))
+            # grows with c, so the highest count bounds it for every mu
+            self.max_term_freqs[term] = max(postings.freqs, default=0)
+            
+            # Cosine: a term contributes query_weight * weight / doc_norm
+            best = 0.0
+            for (doc_id, _), weight in zip(postings, self.tfidf_weights[term]):
+                doc_norm = self.doc_norms[doc_id]
+                if doc_norm > 0:
+                    best = max(best, weight / doc_norm)
+            self.max_normalized_weights[term] = best
+    
+    def compress_postings(self, block_size=128):
+        compressed = defaultdict(PostingsList)
+        
+        for term, postings in self.index.items():
+            # Short lists have nothing to skip and would only grow
+            if len(postings) < block_size:
+                compressed[term] = postings
+                continue
+            
+            # Normalized weights give each block's maximum cosine contribution
+            normalized_weights = [
+                weight / self.doc_norms[doc_id] if self.doc_norms[doc_id] > 0 else 0.0
+                for doc_id, weight in zip(postings.doc_ids, self.tfidf_weights[term])
+            ]
+            compressed[term] = CompressedPostingsList(postings, block_size, normalized_weights)
+        
+        self.index = compressed
+        
+        # Weights are recomputed from counts at query time instead of stored
+        self.tfidf_weights = {}
+    
+    def check_writable(self):
+        if self.mapped_file is not None:
+            raise ValueError("Index loaded from disk is read-only")
+    
+    def add_documents(self, documents):
+        # documents: {doc_id: text} or any iterable of (doc_id, text)
+        self.check_writable()
+        
+        if isinstance(documents, dict):
+            documents = documents.items()
+        
+        # Validate the whole batch before changing anything
+        documents = list(documents)
+        seen = set()
+        for doc_id, _ in documents:
+            if doc_id in self.doc_lengths:
+                raise ValueError(f"Document {doc_id} is already indexed")
+            if doc_id in seen:
+                raise ValueError(f"Document {doc_id} appears twice in the batch")
+            seen.add(doc_id)
+        
+        if not seen.isdisjoint(self.deleted):
+            # Reused ids: drop their old postings first
+            self.purge_deleted()
+        
+        touched_terms = set()
+        num_added = 0
+        
+        for doc_id, text in documents:
+            if not self.lean:
+                self.documents[doc_id] = text
+            
+            tokens = self.preprocessor.preprocess(text)
+            term_counts = Counter(tokens)
+            
+            for term, count in term_counts.items():
+                # Compressed lists are decoded to take new postings and
+                # compressed again when weights are refreshed
+                postings = self.index.get(term)
+                if isinstance(postings, CompressedPostingsList):
+                    self.index[term] = PostingsList(array('I', postings.doc_ids), array('I', postings.freqs))
+                
+                self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+                self.max_term_freqs[term] = max(self.max_term_freqs.get(term, 0), count)
+            
+            self.index_document(doc_id, tokens)
+            touched_terms.update(term_counts)
+            num_added += 1
+        
+        # New doc_ids may be smaller than existing ones
+        for term in touched_terms:
+            self.index[term].sort()
+        
+        self.update_collection_statistics()
+        
+        print(f"✓ Added {num_added:,} documents ({self.num_docs:,} indexed)")
+    
+    def delete_documents(self, doc_ids):
+        self.check_writable()
+        
+        # Validate the whole batch before changing anything
+        doc_ids = list(doc_ids)
+        seen = set()
+        for doc_id in doc_ids:
+            if doc_id not in self.doc_lengths:
+                raise ValueError(f"Document {doc_id} is not indexed")
+            if doc_id in seen:
+                raise ValueError(f"Document {doc_id} appears twice in the batch")
+            seen.add(doc_id)
+        
+        batch_term_counts = self.get_batch_term_counts(doc_ids)
+        
+        num_deleted = 0
+        for doc_id in doc_ids:
+            for term, count in batch_term_counts[doc_id].items():
+                self.doc_freq[term] -= 1
+                self.collection_term_counts[term] -= count
+                if self.collection_term_counts[term] <= 0:
+                    del self.collection_term_counts[term]
+                self.dirty_terms.add(term)
+            
+            self.total_terms -= self.doc_lengths.pop(doc_id)
+            self.doc_norms.pop(doc_id, None)
+            self.doc_term_counts.pop(doc_id, None)
+            self.documents.pop(doc_id, None)
+            if self.forward_index is not None:
+                self.forward_index.pop(doc_id, None)
+            
+            self.deleted.add(doc_id)
+            num_deleted += 1
+        
+        self.update_collection_statistics()
+        
+        print(f"✓ Deleted {num_deleted:,} documents ({self.num_docs:,} indexed)")
+        
+        if len(self.deleted) > self.compact_ratio * max(self.num_docs, 1):
+            self.compact()
+    
+    def update_collection_statistics(self):
+        # Cheap statistics are kept exact; weights and norms depend on every
+        # idf and are recomputed on their next use
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = self.total_terms / self.num_docs if self.num_docs > 0 else 0
+        self.compute_idf()
+        self.weights_stale = True
+        self.version += 1
+    
+    def purge_deleted(self):
+        # Physically remove tombstoned postings; terms left without
+        # documents disappear from the vocabulary
+        for term in self.dirty_terms:
+            postings = self.index.get(term)
+            if postings is None:
+                continue
+            
+            live = [(doc_id, freq) for doc_id, freq in postings if doc_id not in self.deleted]
+            if not live:
+                del self.index[term]
+                for statistics in (self.doc_freq, self.idf, self.max_term_freqs,
+                                   self.max_normalized_weights, self.tfidf_weights):
+                    statistics.pop(term, None)
+                continue
+            
+            self.index[term] = PostingsList(array('I', [doc_id for doc_id, _ in live]),
+                                            array('I', [freq for _, freq in live]))
+            self.max_term_freqs[term] = max(freq for _, freq in live)
+        
+        self.deleted = set()
+        self.dirty_terms = set()
+        self.weights_stale = True
+    
+    def refresh_weights(self):
+        if self.deleted:
+            self.purge_deleted()
+        if not self.weights_stale:
+            return
+        
+        self.weights_stale = False
+        self.compute_vector_weights()
+        self.compute_score_bounds()
+        if self.compression:
+            self.compress_postings()
+    
+    def compact(self):
+        num_deleted = len(self.deleted)
+        self.refresh_weights()
+        
+        print(f"✓ Index compacted ({num_deleted:,} deleted documents purged)")
+    
+    def save(self, path):
+        self.refresh_weights()
+        
+        metadata = {
+            'total_terms': self.total_terms,
+            'avg_doc_length': self.avg_doc_length,
+            'use_stemming': self.preprocessor.use_stemming,
+            'use_stopwords': self.preprocessor.use_stopwords
+        }
+        write_index(self, path, metadata)
+        
+        # Warm stems for query-time preprocessing
+        if getattr(self.preprocessor, 'stem_cache', None) is not None:
+            self.preprocessor.stem_cache.save(path + '.stems')
+        
+        print(f"✓ Index saved to {path}")
+    
+    @classmethod
+    def load(cls, path, preprocessor, postings_cache_bytes=16 * 1024 * 1024):
+        mapped_file = MappedIndexFile(path)
+        metadata = mapped_file.dictionary
+        
+        # Query terms must be preprocessed the same way as the indexed documents
+        if (metadata['use_stemming'] != preprocessor.use_stemming
+                or metadata['use_stopwords'] != preprocessor.use_stopwords):
+            mapped_file.close()
+            raise ValueError(f"Preprocessor settings do not match the index saved in {path}")
+        
+        index = cls(preprocessor, lean=True, postings_cache_bytes=postings_cache_bytes)
+        index.mapped_file = mapped_file
+        
+        stems_path = path + '.stems'
+        if getattr(preprocessor, 'stem_cache', None) is not None and os.path.exists(stems_path):
+            preprocessor.stem_cache.load(stems_path)
+        
+        # Postings and TF-IDF weights are decoded lazily from the mapped file
+        index.index = MappedPostings(mapped_file)
+        index.tfidf_weights = MappedWeights(mapped_file)
+        
+        terms = mapped_file.terms
+        index.doc_freq = {term: entry[TERM_DF] for term, entry in terms.items()}
+        index.idf = {term: entry[TERM_IDF] for term, entry in terms.items()}
+        index.collection_term_counts = Counter({term: entry[TERM_COUNT] for term, entry in terms.items()})
+        index.max_term_freqs = {term: entry[TERM_MAX_TF] for term, entry in terms.items()}
+        index.max_normalized_weights = {term: entry[TERM_MAX_WEIGHT] for term, entry in terms.items()}
+        
+        index.doc_lengths = dict(zip(mapped_file.doc_ids, mapped_file.doc_lengths))
+        index.doc_norms = dict(zip(mapped_file.doc_ids, mapped_file.doc_norms))
+        index.num_docs = metadata['num_docs']
+        index.total_terms = metadata['total_terms']
+        index.avg_doc_length = metadata['avg_doc_length']
+        
+        print(f"✓ Index loaded from {path} ({index.num_docs:,} documents, {len(terms):,} terms)")
+        
+        return index
+    
+    def close(self):
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+            self.mapped_file = None
+    
     def get_postings(self, term):
         
-        return self.index.get(term, [])
+        postings = self.index.get(term, PostingsList())
+        
+        if term in self.dirty_terms:
+            # Skip tombstones of documents deleted since the last compaction
+            live = [(doc_id, freq) for doc_id, freq in postings if doc_id not in self.deleted]
+            return PostingsList(array('I', [doc_id for doc_id, _ in live]),
+                                array('I', [freq for _, freq in live]))
+        
+        return postings
+    
+    def get_decoded_postings(self, term):
+        # Plain in-memory PostingsList for scoring loops. Compressed or mapped
+        # postings are decoded (copied) once and served from the postings
+        # cache while the term stays hot; cold terms stream from storage.
+        if self.postings_cache is None or (not self.compression and self.mapped_file is None):
+            postings = self.get_postings(term)
+            return postings.decode() if isinstance(postings, CompressedPostingsList) else postings
+        
+        if self.postings_cache_version != self.version:
+            self.postings_cache.clear()
+            self.postings_cache_version = self.version
+        
+        postings = self.postings_cache.get(term)
+        if postings is None:
+            postings = self.get_postings(term)
+            if isinstance(postings, CompressedPostingsList):
+                postings = postings.decode()
+            elif self.mapped_file is not None:
+                # Copy out of the mapping so hot terms stay resident
+                postings = PostingsList(array('I', postings.doc_ids), array('I', postings.freqs))
+            self.postings_cache.put(term, postings)
+        return postings
     
     def get_doc_freq(self, term):
 
@@ -115,7 +614,107 @@ class InvertedIndex:
     
     def get_term_count_in_doc(self, term, doc_id):
 
-        return self.doc_term_counts.get(doc_id, {}).get(term, 0)
+        if self.forward_index is not None:
+            term_id = self.term_ids.get(term)
+            if term_id is None or doc_id not in self.forward_index:
+                return 0
+            term_ids, counts = self.forward_index[doc_id]
+            position = bisect.bisect_left(term_ids, term_id)
+            if position < len(term_ids) and term_ids[position] == term_id:
+                return counts[position]
+            return 0
+        
+        if not self.lean:
+            return self.doc_term_counts.get(doc_id, {}).get(term, 0)
+        
+        # No per-document counts (lean or loaded index): search the term's postings
+        return self.get_decoded_postings(term).find(doc_id)
+    
+    def get_tfidf_weights(self, term):
+
+        if self.weights_stale:
+            self.refresh_weights()
+        
+        if self.compression:
+            return array('d', [weight for _, weight in self.get_weighted_postings(term)])
+        return self.tfidf_weights.get(term, array('d'))
+    
+    def get_stored_weights(self, term):
+        # Precomputed weights aligned with get_postings(term), or None when
+        # weights are derived on the fly (compressed postings)
+        if self.weights_stale:
+            self.refresh_weights()
+        
+        if self.compression:
+            return None
+        return self.tfidf_weights.get(term, array('d'))
+    
+    def get_weighted_postings(self, term):
+        # (doc_id, TF-IDF weight) pairs; compressed postings are decoded block
+        # by block and weighted on the fly with the same formula as the stored arrays
+        if self.weights_stale:
+            self.refresh_weights()
+        
+        if not self.compression:
+            postings = self.get_postings(term)
+            return zip(postings.doc_ids, self.tfidf_weights.get(term, array('d')))
+        
+        return self.iter_compressed_weights(self.get_decoded_postings(term), self.get_idf(term))
+    
+    def iter_compressed_weights(self, postings, idf):
+        doc_lengths = self.doc_lengths
+        for doc_ids, freqs in postings.iter_blocks():
+            for doc_id, freq in zip(doc_ids, freqs):
+                yield doc_id, (freq / doc_lengths[doc_id]) * idf
+    
+    def get_doc_norm(self, doc_id):
+
+        if self.weights_stale:
+            self.refresh_weights()
+        
+        return self.doc_norms.get(doc_id, 0.0)
+    
+    def get_max_term_freq(self, term):
+
+        return self.max_term_freqs.get(term, 0)
+    
+    def get_max_normalized_weight(self, term):
+
+        if self.weights_stale:
+            self.refresh_weights()
+        
+        return self.max_normalized_weights.get(term, 0.0)
+    
+    def get_doc_term_counts(self, doc_id):
+
+        if not self.lean:
+            return self.doc_term_counts.get(doc_id, {})
+        
+        if self.forward_index is not None:
+            term_ids, counts = self.forward_index.get(doc_id, ((), ()))
+            return {self.terms[term_id]: count for term_id, count in zip(term_ids, counts)}
+        
+        # Without a forward index every term's postings must be searched
+        term_counts = {}
+        for term in self.index.keys():
+            count = self.get_term_count_in_doc(term, doc_id)
+            if count:
+                term_counts[term] = count
+        return term_counts
+    
+    def get_batch_term_counts(self, doc_ids):
+        # {doc_id: {term: count}} for several documents at once. Without
+        # per-document counts or a forward index the postings are scanned
+        # once for the whole batch instead of once per document.
+        if not self.lean or self.forward_index is not None:
+            return {doc_id: self.get_doc_term_counts(doc_id) for doc_id in doc_ids}
+        
+        batch_term_counts = {doc_id: {} for doc_id in doc_ids}
+        for term, postings in self.index.items():
+            for doc_id, freq in postings:
+                if doc_id in batch_term_counts:
+                    batch_term_counts[doc_id][term] = freq
+        return batch_term_counts
     
     def get_doc_length(self, doc_id):
 
@@ -137,7 +736,7 @@ class InvertedIndex:
     
     def get_documents_containing_term(self, term):
 
-        return [doc_id for doc_id, _ in self.get_postings(term)]
+        return list(self.get_postings(term).doc_ids)
     
     def print_statistics(self):
 
@@ -171,7 +770,44 @@ class InvertedIndex:
         for term, df in sorted_by_df[-5:]:
             print(f"  '{term}': appears in {df} docs ({df/self.num_docs*100:.1f}%)")
         
+        if getattr(self.preprocessor, 'stem_cache', None) is not None:
+            print()
+            self.preprocessor.stem_cache.print_statistics()
+        
+        if self.postings_cache is not None and (self.compression or self.mapped_file is not None):
+            if getattr(self.preprocessor, 'stem_cache', None) is None:
+                print()
+            self.postings_cache.print_statistics()
+        
+        print("=" * 70)
+    
+    def memory_report(self):
+        # Approximate bytes held by each structure (shared objects counted once)
+        seen = set()
+        structures = [
+            ('Raw documents', self.documents),
+            ('Per-document Counters', self.doc_term_counts),
+            ('Forward index', self.forward_index if self.forward_index is not None else {}),
+            ('Postings', self.index if self.mapped_file is None else {}),
+            ('TF-IDF weights', self.tfidf_weights if self.mapped_file is None else {}),
+            ('Doc lengths / norms', [self.doc_lengths, self.doc_norms]),
+            ('Term statistics', [self.doc_freq, self.idf, self.collection_term_counts,
+                                 self.max_term_freqs, self.max_normalized_weights]),
+        ]
+        
+        report = {name: deep_sizeof(structure, seen) for name, structure in structures}
+        report['Total'] = sum(report.values())
+        
+        print("\n" + "=" * 70)
+        print(f"INDEX MEMORY REPORT ({'lean' if self.lean else 'full'} mode)")
         print("=" * 70)
+        
+        for name, size in report.items():
+            print(f"  {name + ':':<26} {size / 1024 / 1024:>8.2f} MB")
+        
+        print("=" * 70)
+        
+        return report
     
     def search_term(self, term):
 
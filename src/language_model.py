@@ -1,13 +1,78 @@
 import math
+from collections import Counter
+
+from batch import retrieve_batch
+from pruning import TermCursor, maxscore_top_k
+from ranking import select_top_k
 
 class UnigramLanguageModel:    
-    def __init__(self, index, mu=2000):
+    def __init__(self, index, mu=2000, result_cache=None):
         self.index = index
         self.preprocessor = index.preprocessor
         self.mu = mu
         
+        # Optional QueryCache of ranked results, consulted by retrieve
+        self.result_cache = result_cache
+        
+        # Per-document log(mu / (|d| + mu)), rebuilt whenever mu or the index changes
+        self.length_norms = {}
+        self.length_norms_mu = None
+        self.length_norms_version = None
+        self.docs_by_length = []
+        self.docs_by_id = []
+        self.compute_length_norms()
+        
+        # Postings scored/skipped by the last retrieve_pruned call
+        self.last_pruning_stats = None
+        
         print(f"Unigram Language Model initialized (μ={mu}, using shared index)")
     
+    def compute_length_norms(self):
+        doc_lengths = self.index.doc_lengths
+        
+        self.length_norms = {
+            doc_id: math.log(self.mu / (length + self.mu))
+            for doc_id, length in doc_lengths.items()
+        }
+        self.length_norms_mu = self.mu
+        self.length_norms_version = self.index.version
+        
+        # Shortest documents first = best score among documents that
+        # match no query term (ties broken by doc_id)
+        self.docs_by_length = sorted(doc_lengths.keys(), key=lambda d: (doc_lengths[d], d))
+        self.docs_by_id = sorted(doc_lengths.keys())
+    
+    def prepare_query(self, query_terms):
+        # Dirichlet query likelihood rewritten as
+        #   log P(q|d) = sum_t log P(t|C)                        (query constant)
+        #              + n * log(mu / (|d| + mu))                (document length only)
+        #              + sum_{t in d} log(1 + c(t,d) / (mu * P(t|C)))
+        # so only documents in the query terms' postings need term-specific work
+        if self.length_norms_mu != self.mu or self.length_norms_version != self.index.version:
+            self.compute_length_norms()
+        
+        query_constant = 0.0
+        num_query_terms = 0
+        scoring_terms = []  # [(term, query count, mu * P(t|C)), ...]
+        
+        for term, query_count in Counter(query_terms).items():
+            collection_prob = self.index.get_collection_prob(term)
+            
+            # Terms unseen in the collection have zero probability and are skipped
+            if collection_prob == 0:
+                continue
+            
+            query_constant += query_count * math.log(collection_prob)
+            num_query_terms += query_count
+            scoring_terms.append((term, query_count, self.mu * collection_prob))
+        
+        return query_constant, num_query_terms, scoring_terms
+    
+    def unmatched_candidates(self, num_query_terms):
+        # Documents in the order they rank when they match no query term:
+        # shortest first, unless no term scores and all documents tie
+        return self.docs_by_length if num_query_terms > 0 else self.docs_by_id
+    
     def compute_document_prob(self, term, doc_id):
         # Get term count in document from index
         term_count_doc = self.index.get_term_count_in_doc(term, doc_id)
@@ -35,22 +100,158 @@ class UnigramLanguageModel:
         
         return log_likelihood
     
+    def cache_key(self, query_terms, top_k):
+        return self.result_cache.make_key(self.index.index_id, 'lm', (self.mu,), top_k, query_terms)
+    
     def retrieve(self, query_text, top_k=100):
         # Preprocess query
         query_terms = self.preprocessor.preprocess(query_text)
         
+        if self.result_cache is None:
+            return self.retrieve_terms(query_terms, top_k)
+        
+        # Repeated queries (same term bag, mu and index version) come from the cache
+        key = self.cache_key(query_terms, top_k)
+        results = self.result_cache.get(key, self.index.version)
+        if results is None:
+            results = self.retrieve_terms(query_terms, top_k)
+            self.result_cache.put(key, self.index.version, results)
+        return results
+    
+    def retrieve_terms(self, query_terms, top_k=100):
+        query = self.begin_query(query_terms)
+        
+        if query is None:
+            return []
+        
+        term_data, query_context = query
+        
+        accumulators = {}
+        for term, data in term_data.items():
+            self.accumulate(term, data, self.index.get_decoded_postings(term), accumulators)
+        
+        return self.finish_query(query_context, accumulators, top_k)
+    
+    # Hooks for shared retrieval across models (MultiModelRetriever): the
+    # query is preprocessed and each term's postings fetched only once
+    
+    def begin_query(self, query_terms):
+        # ({term: (query count, mu * P(t|C))}, (query constant, query length)),
+        # or None for an empty query
+        if not query_terms:
+            return None
+        
+        query_constant, num_query_terms, scoring_terms = self.prepare_query(query_terms)
+        term_data = {term: (query_count, smoothed_mass)
+                     for term, query_count, smoothed_mass in scoring_terms}
+        return term_data, (query_constant, num_query_terms)
+    
+    def accumulate(self, term, term_data, postings, accumulators):
+        query_count, smoothed_mass = term_data
+        for doc_id, term_count in postings:
+            accumulators[doc_id] = (accumulators.get(doc_id, 0.0)
+                                    + query_count * math.log1p(term_count / smoothed_mass))
+    
+    def finish_query(self, query_context, accumulators, top_k):
+        query_constant, num_query_terms = query_context
+        
+        # Candidates: every matched document, plus the top_k best-scoring
+        # unmatched documents
+        candidates = list(accumulators.keys())
+        num_unmatched = 0
+        for doc_id in self.unmatched_candidates(num_query_terms):
+            if num_unmatched >= top_k:
+                break
+            if doc_id not in accumulators:
+                candidates.append(doc_id)
+                num_unmatched += 1
+        
+        scores = {}
+        for doc_id in candidates:
+            scores[doc_id] = (query_constant
+                              + num_query_terms * self.length_norms[doc_id]
+                              + accumulators.get(doc_id, 0.0))
+        
+        # Select top-K (ties broken by doc_id)
+        return select_top_k(scores, top_k)
+    
+    def retrieve_pruned(self, query_text, top_k=100):
+        # Exact top-K with MaxScore dynamic pruning; the postings scored and
+        # skipped for the last query are kept in self.last_pruning_stats
+        self.last_pruning_stats = None
+        query_terms = self.preprocessor.preprocess(query_text)
+        
+        if not query_terms:
+            return []
+        
+        query_constant, num_query_terms, scoring_terms = self.prepare_query(query_terms)
+        
+        cursors = []
+        for term, query_count, smoothed_mass in scoring_terms:
+            postings = self.index.get_postings(term)
+            
+            def contribution(doc_id, freq, query_count=query_count, smoothed_mass=smoothed_mass):
+                return query_count * math.log1p(freq / smoothed_mass)
+            
+            # The highest count in the postings (or block) gives the largest contribution
+            block_bound = None
+            if hasattr(postings, 'block_max_freq'):
+                def block_bound(block, postings=postings, query_count=query_count,
+                                smoothed_mass=smoothed_mass):
+                    return query_count * math.log1p(postings.block_max_freq[block] / smoothed_mass)
+            
+            upper_bound = query_count * math.log1p(self.index.get_max_term_freq(term) / smoothed_mass)
+            cursors.append(TermCursor(term, postings, upper_bound, contribution, block_bound))
+        
+        def base_score(doc_id):
+            return query_constant + num_query_terms * self.length_norms[doc_id]
+        
+        def finalize(doc_id, matches):
+            # Same summation order as retrieve, so scores are identical
+            matched = 0.0
+            for term, query_count, smoothed_mass in scoring_terms:
+                if term in matches:
+                    matched += query_count * math.log1p(matches[term] / smoothed_mass)
+            return base_score(doc_id) + matched
+        
+        # Every document scores at least its length-only base score, so the
+        # top_k best unmatched candidates give an early threshold
+        seeds = [(doc_id, base_score(doc_id))
+                 for doc_id in self.unmatched_candidates(num_query_terms)[:top_k]]
+        best_base = seeds[0][1] if seeds else 0.0
+        
+        ranked_docs, self.last_pruning_stats = maxscore_top_k(
+            cursors, top_k, finalize,
+            base_score=base_score, base_bound=best_base, seeds=seeds
+        )
+        return ranked_docs
+    
+    def retrieve_exhaustive(self, query_text, top_k=100):
+        # Reference implementation: score every document term by term
+        query_terms = self.preprocessor.preprocess(query_text)
+        
         if not query_terms:
             return []
         
         # Score all documents
         scores = {}
-        for doc_id in self.index.documents.keys():
+        for doc_id in self.index.doc_lengths.keys():
             score = self.score_document(query_terms, doc_id)
             scores[doc_id] = score
         
-        # Sort and return top-K
-        ranked_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return ranked_docs[:top_k]
+        # Select top-K (ties broken by doc_id)
+        return select_top_k(scores, top_k)
+    
+    def retrieve_batch(self, queries, top_k=100, workers=None, method='retrieve'):
+        # {query_id: results} for {query_id: query_text}, spread over a
+        # pool of forked processes that share this model's index
+        return retrieve_batch(self, queries, top_k, workers, method)
+    
+    def sweep_mu(self, queries, mu_values, top_k=100, relevances=None, k_values=[5, 10], graded=False):
+        # {mu: {'results': {query_id: results}, 'aggregated': metrics}} for
+        # every mu from one pass over the queries' postings; self.mu is untouched
+        from parameter_sweep import sweep_dirichlet_mu  # NumPy is only needed for sweeps
+        return sweep_dirichlet_mu(self, queries, mu_values, top_k, relevances, k_values, graded)
     
     def explain_query(self, query_text, top_n=5):
         print("\n" + "=" * 70)
@@ -1,8 +1,11 @@
+import os
+
 from data_processing import read_cranfield_data
 from preprocessing import TextPreprocessor
 from indexer import InvertedIndex
 from vsm import VectorSpaceModel
 from language_model import UnigramLanguageModel
+from multi_scorer import MultiModelRetriever
 from evaluation import evaluate_model
 
 
@@ -354,12 +357,15 @@ def run_sample_queries(model, model_name, queries, documents, num_samples=3):
     print("\n" + "=" * 70)
 
 
-def run_all_queries(model, queries):
-    """Run all queries through the model."""
-    results = {}
-    for query_id, query_text in queries.items():
-        results[query_id] = model.retrieve(query_text, top_k=100)
-    return results
+def run_all_queries(model, queries, workers=None):
+    """Run all queries through the model, one process per core."""
+    return model.retrieve_batch(queries, top_k=100, workers=workers)
+
+
+def run_all_queries_shared(models, index, queries, workers=None):
+    """Run all queries through several models, preprocessing and reading postings once."""
+    retriever = MultiModelRetriever(index, models)
+    return retriever.retrieve_batch(queries, top_k=100, workers=workers)
 
 
 def compare_models(vsm_results, lm_results, queries, num_examples=2):
@@ -409,6 +415,8 @@ def main():
     USE_STEMMING = True
     USE_STOPWORDS = True
     DIRICHLET_MU = 2000
+    INDEX_FILE = "data/cranfield/cranfield.idx"  # delete to force a rebuild
+    GRADED_RELEVANCE = False  # graded nDCG/ERR from the cranqrel grades
     
     # ========================================================================
     # STEP 1: Load Data
@@ -426,11 +434,16 @@ def main():
     )
     
     # ========================================================================
-    # STEP 3: Build Shared Index
+    # STEP 3: Build (or Load) Shared Index
     # ========================================================================
-    print("\n[STEP 3] Building Shared Inverted Index...")
-    index = InvertedIndex(preprocessor)
-    index.build_index(documents)
+    if os.path.exists(INDEX_FILE):
+        print(f"\n[STEP 3] Loading Shared Inverted Index from {INDEX_FILE}...")
+        index = InvertedIndex.load(INDEX_FILE, preprocessor)
+    else:
+        print("\n[STEP 3] Building Shared Inverted Index...")
+        index = InvertedIndex(preprocessor, lean=True)
+        index.build_index(documents)
+        index.save(INDEX_FILE)
     
     # ========================================================================
     # STEP 4: Initialize Models
@@ -450,11 +463,10 @@ def main():
     # STEP 6: Run All Queries
     # ========================================================================
     print("\n[STEP 6] Processing All Queries...")
-    print("  Running VSM on all queries...")
-    vsm_results = run_all_queries(vsm, queries)
-    
-    print("  Running Unigram LM on all queries...")
-    lm_results = run_all_queries(lm, queries)
+    print("  Running VSM and Unigram LM on all queries (shared pass)...")
+    results = run_all_queries_shared({'VSM': vsm, 'LM': lm}, index, queries)
+    vsm_results = results['VSM']
+    lm_results = results['LM']
     
     print(f"\n✓ Processed {len(queries)} queries with both models")
     
@@ -473,7 +485,8 @@ def main():
         queries,
         relevances,
         vsm_results,
-        k_values=[5, 10]
+        k_values=[5, 10],
+        graded=GRADED_RELEVANCE
     )
     
     lm_eval = evaluate_model(
@@ -481,7 +494,8 @@ def main():
         queries,
         relevances,
         lm_results,
-        k_values=[5, 10]
+        k_values=[5, 10],
+        graded=GRADED_RELEVANCE
     )
     
     # ========================================================================
@@ -489,7 +503,6 @@ def main():
     # ========================================================================
     print("\n[STEP 9] Saving Results...")
     
-    import os
     os.makedirs("results", exist_ok=True)
     
     # Save original simple results file (for backward compatibility)
@@ -0,0 +1,82 @@
+from batch import retrieve_batch
+
+
+class MultiModelRetriever:
+    """Scores one query with several models in a single pass.
+
+    The query is preprocessed once and each query term's postings are
+    fetched (and decoded, for compressed or mapped indexes) once; every model
+    then accumulates its own scores from the same postings and returns its
+    own top-K. Models plug in through begin_query / accumulate / finish_query
+    and must share the index (and so the preprocessor).
+    """
+    
+    def __init__(self, index, models):
+        self.index = index
+        self.preprocessor = index.preprocessor
+        self.models = models  # {name: model}
+        
+        for name, model in models.items():
+            if model.index is not index:
+                raise ValueError(f"Model {name} does not use the shared index")
+        
+        print(f"Multi-model retriever initialized ({', '.join(models)})")
+    
+    def retrieve(self, query_text, top_k=100):
+        # {model name: [(doc_id, score), ...]}
+        query_terms = self.preprocessor.preprocess(query_text)
+        
+        # Models with a result cache answer repeated queries from it and
+        # drop out of the shared pass
+        cached = {}
+        cache_keys = {}
+        for name, model in self.models.items():
+            if getattr(model, 'result_cache', None) is not None:
+                cache_keys[name] = model.cache_key(query_terms, top_k)
+                results = model.result_cache.get(cache_keys[name], self.index.version)
+                if results is not None:
+                    cached[name] = results
+        
+        queries = {}
+        for name, model in self.models.items():
+            if name in cached:
+                continue
+            query = model.begin_query(query_terms)
+            if query is not None:
+                queries[name] = query
+        
+        accumulators = {name: {} for name in queries}
+        
+        # Query terms in first-occurrence order, as every model visits them,
+        # so each model's sums are identical to its own retrieve
+        for term in dict.fromkeys(query_terms):
+            scorers = [name for name, (term_data, _) in queries.items() if term in term_data]
+            if not scorers:
+                continue
+            
+            postings = self.index.get_decoded_postings(term)
+            
+            for name in scorers:
+                self.models[name].accumulate(term, queries[name][0][term], postings, accumulators[name])
+        
+        results = {}
+        for name, model in self.models.items():
+            if name in cached:
+                results[name] = cached[name]
+                continue
+            
+            if name in queries:
+                results[name] = model.finish_query(queries[name][1], accumulators[name], top_k)
+            else:
+                results[name] = []
+            
+            if name in cache_keys:
+                model.result_cache.put(cache_keys[name], self.index.version, results[name])
+        return results
+    
+    def retrieve_batch(self, queries, top_k=100, workers=None):
+        # {model name: {query_id: results}}, queries spread over worker processes
+        by_query = retrieve_batch(self, queries, top_k, workers)
+        
+        return {name: {query_id: results[name] for query_id, results in by_query.items()}
+                for name in self.models}
@@ -0,0 +1,132 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+from evaluation import compute_metrics, graded_ideal_dcg_prefixes, resolve_max_grade
+from ranking import select_top_k
+
+
+def sweep_dirichlet_mu(model, queries, mu_values, top_k=100, relevances=None, k_values=[5, 10], graded=False):
+    """Rank every query under many Dirichlet mu values in one pass.
+    
+    Each query is preprocessed and its postings fetched once. The matched
+    term counts of its candidates go into a small dense matrix, and the
+    log1p term contributions for all mu values come from one NumPy
+    expression per term. Terms are summed in the same order as
+    UnigramLanguageModel.retrieve, so each mu's ranking is the one a full
+    run at that mu returns (scores agree up to floating-point rounding).
+    
+    Returns {mu: {'results': {query_id: [(doc_id, score), ...]},
+    'aggregated': metrics or None}}. Metrics need relevances.
+    """
+    index = model.index
+    mu_values = list(mu_values)
+    mu_array = np.array(mu_values, dtype=np.float64)
+    
+    # Candidate order for unmatched documents depends on length only
+    if model.length_norms_version != index.version:
+        model.compute_length_norms()
+    
+    # log(mu / (|d| + mu)) per document and mu, with math.log as in
+    # compute_length_norms
+    doc_positions = {doc_id: i for i, doc_id in enumerate(index.doc_lengths)}
+    length_norms = np.array([[math.log(mu / (length + mu)) for mu in mu_values]
+                             for length in index.doc_lengths.values()], dtype=np.float64).reshape(-1, len(mu_values))
+    
+    runs = {mu: {} for mu in mu_values}
+    
+    for query_id, query_text in queries.items():
+        query_terms = model.preprocessor.preprocess(query_text)
+        
+        if not query_terms:
+            for mu in mu_values:
+                runs[mu][query_id] = []
+            continue
+        
+        # Same terms, counts and query constant as prepare_query
+        query_constant = 0.0
+        num_query_terms = 0
+        scoring_terms = []  # [(query count, P(t|C), postings), ...]
+        for term, query_count in Counter(query_terms).items():
+            collection_prob = index.get_collection_prob(term)
+            if collection_prob == 0:
+                continue
+            query_constant += query_count * math.log(collection_prob)
+            num_query_terms += query_count
+            scoring_terms.append((query_count, collection_prob, index.get_decoded_postings(term)))
+        
+        # Candidates: every matched document, plus the top_k best-scoring
+        # unmatched documents (as in finish_query)
+        candidates = {}
+        for _, _, postings in scoring_terms:
+            for doc_id in postings.doc_ids:
+                if doc_id not in candidates:
+                    candidates[doc_id] = len(candidates)
+        num_unmatched = 0
+        for doc_id in model.unmatched_candidates(num_query_terms):
+            if num_unmatched >= top_k:
+                break
+            if doc_id not in candidates:
+                candidates[doc_id] = len(candidates)
+                num_unmatched += 1
+        
+        candidate_ids = list(candidates)
+        
+        # Matched contributions, summed term by term in query order:
+        # (mu values x candidates); unmatched terms add log1p(0) = 0.0
+        accumulators = np.zeros((len(mu_values), len(candidate_ids)), dtype=np.float64)
+        for query_count, collection_prob, postings in scoring_terms:
+            counts = np.zeros(len(candidate_ids), dtype=np.float64)
+            counts[[candidates[doc_id] for doc_id in postings.doc_ids]] = postings.freqs
+            smoothed_mass = mu_array * collection_prob
+            accumulators = accumulators + query_count * np.log1p(counts[np.newaxis, :] / smoothed_mass[:, np.newaxis])
+        
+        norms = length_norms[[doc_positions[doc_id] for doc_id in candidate_ids]].T
+        scores = (query_constant + num_query_terms * norms) + accumulators
+        
+        for row, mu in enumerate(mu_values):
+            row_scores = scores[row]
+            
+            # Only candidates scoring at least the k-th best (ties included)
+            # go through the doc_id tie-breaking selection
+            keep = range(len(candidate_ids))
+            if len(candidate_ids) > top_k > 0:
+                kth_score = np.partition(row_scores, len(candidate_ids) - top_k)[len(candidate_ids) - top_k]
+                keep = np.flatnonzero(row_scores >= kth_score).tolist()
+            
+            runs[mu][query_id] = select_top_k([(candidate_ids[i], float(row_scores[i])) for i in keep], top_k)
+    
+    # Judgment-side work (top grade, ideal DCG prefixes) is shared by all mu
+    max_grade = ideal_prefixes = None
+    if relevances is not None and graded:
+        max_grade = resolve_max_grade(relevances)
+        ideal_prefixes = graded_ideal_dcg_prefixes(relevances)
+    
+    sweep = {}
+    for mu in mu_values:
+        aggregated = None
+        if relevances is not None:
+            aggregated = compute_metrics(queries, relevances, runs[mu], k_values, graded,
+                                         max_grade, ideal_prefixes)['aggregated']
+        sweep[mu] = {'results': runs[mu], 'aggregated': aggregated}
+    
+    return sweep
+
+
+def print_sweep(sweep, metric_names=['MAP', 'P@10', 'nDCG@10']):
+    print("\n" + "=" * 70)
+    print("DIRICHLET μ SWEEP")
+    print("=" * 70)
+    
+    print(f"\n{'μ':>8} " + " ".join(f"{name:>10}" for name in metric_names))
+    print("-" * 70)
+    for mu, run in sweep.items():
+        aggregated = run['aggregated'] or {}
+        print(f"{mu:>8} " + " ".join(f"{aggregated.get(name, 0.0):>10.4f}" for name in metric_names))
+    
+    scored = [(run['aggregated'][metric_names[0]], mu) for mu, run in sweep.items() if run['aggregated']]
+    if scored:
+        best_score, best_mu = max(scored, key=lambda x: (x[0], -x[1]))
+        print(f"\nBest μ by {metric_names[0]}: {best_mu} ({best_score:.4f})")
+    print("=" * 70)
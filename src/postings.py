@@ -0,0 +1,304 @@
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class PostingsList:
+    """One term's postings as parallel typed arrays of doc_ids and counts.
+
+    Iterating yields (doc_id, freq) tuples and indexing returns one tuple,
+    so code written against the old list-of-tuples layout keeps working.
+    Each posting costs 8 bytes instead of a boxed tuple.
+    """
+    
+    __slots__ = ('doc_ids', 'freqs')
+    
+    def __init__(self, doc_ids=None, freqs=None):
+        self.doc_ids = doc_ids if doc_ids is not None else array('I')
+        self.freqs = freqs if freqs is not None else array('I')
+    
+    def append(self, doc_id, freq):
+        self.doc_ids.append(doc_id)
+        self.freqs.append(freq)
+    
+    def sort(self):
+        # Order postings by doc_id (no-op for the usual in-order build)
+        doc_ids = self.doc_ids
+        if all(doc_ids[i] < doc_ids[i + 1] for i in range(len(doc_ids) - 1)):
+            return
+        
+        order = sorted(range(len(doc_ids)), key=doc_ids.__getitem__)
+        self.doc_ids = array('I', [doc_ids[i] for i in order])
+        self.freqs = array('I', [self.freqs[i] for i in order])
+    
+    def __len__(self):
+        return len(self.doc_ids)
+    
+    def __iter__(self):
+        return zip(self.doc_ids, self.freqs)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return PostingsList(self.doc_ids[position], self.freqs[position])
+        return (self.doc_ids[position], self.freqs[position])
+    
+    def __repr__(self):
+        return f"PostingsList({list(self)!r})"
+    
+    def iter_blocks(self):
+        # The whole list is one block (see CompressedPostingsList)
+        yield self.doc_ids, self.freqs
+    
+    def find(self, doc_id):
+        # Count of doc_id in this term's postings (0 if absent)
+        position = bisect.bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return self.freqs[position]
+        return 0
+
+
+def vbyte_encode(values, out):
+    # 7 bits per byte, high bit marks the last byte of each value
+    for value in values:
+        while value >= 128:
+            out.append(value & 127)
+            value >>= 7
+        out.append(value | 128)
+
+
+def vbyte_decode(data, start, count):
+    values = []
+    position = start
+    for _ in range(count):
+        value = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            if byte & 128:
+                value |= (byte & 127) << shift
+                break
+            value |= byte << shift
+            shift += 7
+        values.append(value)
+    return values, position
+
+
+class CompressedPostingsList:
+    """Postings in blocks of delta + variable-byte encoded doc_ids and counts.
+
+    Per-block metadata (last doc_id, byte offset, highest count and highest
+    normalized TF-IDF weight) lets readers skip blocks without decoding them.
+    Iteration decodes one block at a time.
+    """
+    
+    __slots__ = ('data', 'length', 'block_size', 'block_last_doc', 'block_offsets',
+                 'block_max_freq', 'block_max_weight')
+    
+    def __init__(self, postings, block_size=128, normalized_weights=None):
+        self.length = len(postings)
+        self.block_size = block_size
+        self.block_last_doc = array('I')
+        self.block_offsets = array('I')
+        self.block_max_freq = array('I')
+        self.block_max_weight = array('d')
+        
+        data = bytearray()
+        previous_doc = 0
+        doc_ids, freqs = postings.doc_ids, postings.freqs
+        
+        for start in range(0, self.length, block_size):
+            block_docs = doc_ids[start:start + block_size]
+            block_freqs = freqs[start:start + block_size]
+            
+            self.block_offsets.append(len(data))
+            self.block_last_doc.append(block_docs[-1])
+            self.block_max_freq.append(max(block_freqs))
+            if normalized_weights is not None:
+                self.block_max_weight.append(max(normalized_weights[start:start + block_size]))
+            
+            # doc_ids as gaps from the previous posting (first gap spans blocks)
+            gaps = [block_docs[0] - previous_doc]
+            gaps.extend(block_docs[i] - block_docs[i - 1] for i in range(1, len(block_docs)))
+            vbyte_encode(gaps, data)
+            vbyte_encode(block_freqs, data)
+            previous_doc = block_docs[-1]
+        
+        self.data = bytes(data)
+    
+    def num_blocks(self):
+        return len(self.block_offsets)
+    
+    def block_length(self, block):
+        return min(self.block_size, self.length - block * self.block_size)
+    
+    def decode_block(self, block):
+        count = self.block_length(block)
+        gaps, position = vbyte_decode(self.data, self.block_offsets[block], count)
+        freqs, _ = vbyte_decode(self.data, position, count)
+        
+        doc_id = self.block_last_doc[block - 1] if block > 0 else 0
+        doc_ids = []
+        for gap in gaps:
+            doc_id += gap
+            doc_ids.append(doc_id)
+        
+        return doc_ids, freqs
+    
+    def iter_blocks(self):
+        for block in range(self.num_blocks()):
+            yield self.decode_block(block)
+    
+    def decode(self):
+        postings = PostingsList()
+        for doc_ids, freqs in self.iter_blocks():
+            postings.doc_ids.extend(doc_ids)
+            postings.freqs.extend(freqs)
+        return postings
+    
+    @property
+    def doc_ids(self):
+        return self.decode().doc_ids
+    
+    @property
+    def freqs(self):
+        return self.decode().freqs
+    
+    def find(self, doc_id):
+        # Only the one block that can hold doc_id is decoded
+        block = bisect.bisect_left(self.block_last_doc, doc_id)
+        if block == self.num_blocks():
+            return 0
+        doc_ids, freqs = self.decode_block(block)
+        position = bisect.bisect_left(doc_ids, doc_id)
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return freqs[position]
+        return 0
+    
+    def __len__(self):
+        return self.length
+    
+    def __iter__(self):
+        for doc_ids, freqs in self.iter_blocks():
+            yield from zip(doc_ids, freqs)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return self.decode()[position]
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError("postings index out of range")
+        doc_ids, freqs = self.decode_block(position // self.block_size)
+        offset = position % self.block_size
+        return (doc_ids[offset], freqs[offset])
+    
+    def __repr__(self):
+        return f"CompressedPostingsList({self.length} postings, {self.num_blocks()} blocks)"
+
+
+class PostingsCache:
+    """Byte-bounded cache of decoded postings with segmented LRU eviction.
+    
+    A term enters the probationary segment on its first miss and moves to
+    the protected segment (protected_ratio of the budget) when hit again.
+    Protected overflow falls back to probation and evictions come from the
+    probationary end, so terms seen once cannot flush the hot set.
+    """
+    
+    def __init__(self, max_bytes=16 * 1024 * 1024, protected_ratio=0.8):
+        self.max_bytes = max_bytes
+        self.max_protected_bytes = int(max_bytes * protected_ratio)
+        
+        self.probation = OrderedDict()  # {term: (PostingsList, bytes)}
+        self.protected = OrderedDict()  # {term: (PostingsList, bytes)}
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.promotions = 0
+        
+        # Scoring threads of one server share the cache
+        self.lock = threading.Lock()
+    
+    def __getstate__(self):
+        # The lock is not pickled; an unpickled cache gets a fresh one
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def postings_size(postings):
+        return 64 + postings.doc_ids.itemsize * len(postings) + postings.freqs.itemsize * len(postings)
+    
+    def get(self, term):
+        with self.lock:
+            entry = self.protected.get(term)
+            if entry is not None:
+                self.hits += 1
+                self.protected.move_to_end(term)
+                return entry[0]
+            
+            entry = self.probation.pop(term, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            # Second hit: promote, demoting the coldest protected terms if needed
+            self.hits += 1
+            self.promotions += 1
+            self.probation_bytes -= entry[1]
+            self.protected[term] = entry
+            self.protected_bytes += entry[1]
+            
+            while self.protected_bytes > self.max_protected_bytes and len(self.protected) > 1:
+                demoted, demoted_entry = self.protected.popitem(last=False)
+                self.protected_bytes -= demoted_entry[1]
+                self.probation[demoted] = demoted_entry
+                self.probation_bytes += demoted_entry[1]
+            
+            return entry[0]
+    
+    def put(self, term, postings):
+        with self.lock:
+            if term in self.probation or term in self.protected:
+                # Another thread missed on the same term and got here first
+                return
+            
+            size = self.postings_size(postings)
+            if size > self.max_bytes - self.protected_bytes:
+                # Larger than the probationary space: streamed on every use
+                return
+            
+            self.probation[term] = (postings, size)
+            self.probation_bytes += size
+            
+            while self.probation_bytes + self.protected_bytes > self.max_bytes:
+                _, evicted = self.probation.popitem(last=False)
+                self.probation_bytes -= evicted[1]
+                self.evictions += 1
+    
+    def clear(self):
+        with self.lock:
+            self.probation.clear()
+            self.protected.clear()
+            self.probation_bytes = 0
+            self.protected_bytes = 0
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+    
+    def print_statistics(self):
+        print(f"Postings cache: {len(self.probation) + len(self.protected):,} terms "
+              f"({len(self.protected):,} protected), "
+              f"{(self.probation_bytes + self.protected_bytes) / 1024:.1f}/{self.max_bytes / 1024:.1f} KB, "
+              f"{self.hits:,} hits, {self.misses:,} misses, {self.promotions:,} promotions, "
+              f"{self.evictions:,} evictions, hit rate {self.hit_rate() * 100:.1f}%")
@@ -1,5 +1,7 @@
+import json
 import re
-from collections import Counter
+import threading
+from collections import Counter, OrderedDict
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
@@ -11,18 +13,129 @@ except LookupError:
     print("Downloading NLTK stopwords...")
     nltk.download('stopwords', quiet=True)
 
+# Alphabetic words, compiled once for all texts
+TOKEN_PATTERN = re.compile(r'\b[a-z]+\b')
+
+# The same words without single letters, which tokenize drops anyway
+INDEX_TOKEN_PATTERN = re.compile(r'\b[a-z]{2,}\b')
+
+
+class StemCache:
+    """Bounded term → stem memo with hit/miss counters.
+    
+    policy 'lru' evicts the least recently used term, 'fifo' the oldest
+    inserted one (cheaper hits, no reordering).
+    """
+    
+    POLICIES = ('lru', 'fifo')
+    
+    def __init__(self, max_size=50000, policy='lru'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown stem cache policy: {policy}")
+        
+        self.max_size = max_size
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        # Scoring threads of one server share the preprocessor
+        self.lock = threading.Lock()
+    
+    def __getstate__(self):
+        # Locks cannot be pickled; spawned build workers get a copy with a fresh one
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    
+    def get(self, term):
+        with self.lock:
+            stem = self.entries.get(term)
+            if stem is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            if self.policy == 'lru':
+                self.entries.move_to_end(term)
+            return stem
+    
+    def put(self, term, stem):
+        with self.lock:
+            self.insert(term, stem)
+    
+    def insert(self, term, stem):
+        # put without the lock, for callers that already hold it
+        if self.max_size <= 0:
+            return
+        
+        self.entries[term] = stem
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stem_all(self, terms, stem_function):
+        # get/put for a whole token list under one lock acquisition: same
+        # stems, counters and eviction order as one call per token
+        with self.lock:
+            entries = self.entries
+            lru = self.policy == 'lru'
+            stems = []
+            misses = 0
+            for term in terms:
+                stem = entries.get(term)
+                if stem is None:
+                    misses += 1
+                    stem = stem_function(term)
+                    self.insert(term, stem)
+                elif lru:
+                    entries.move_to_end(term)
+                stems.append(stem)
+            
+            self.misses += misses
+            self.hits += len(stems) - misses
+            return stems
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+    
+    def save(self, path):
+        # Oldest first, so loading replays the eviction order
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.entries.items()), f)
+    
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for term, stem in json.load(f):
+                self.put(term, stem)
+    
+    def print_statistics(self):
+        print(f"Stem cache: {len(self.entries):,}/{self.max_size:,} entries ({self.policy}), "
+              f"{self.hits:,} hits, {self.misses:,} misses, {self.evictions:,} evictions, "
+              f"hit rate {self.hit_rate() * 100:.1f}%")
+
 
 class TextPreprocessor:
     
-    def __init__(self, use_stemming=True, use_stopwords=True):
+    def __init__(self, use_stemming=True, use_stopwords=True,
+                 stem_cache_size=50000, stem_cache_policy='lru'):
         self.use_stemming = use_stemming
         self.use_stopwords = use_stopwords
         
-        # Initialize Porter Stemmer
+        # Initialize Porter Stemmer (with a memo of term → stem: natural
+        # language is Zipfian, so most stem calls repeat)
         if use_stemming:
             self.stemmer = PorterStemmer()
+            self.stem_cache = StemCache(stem_cache_size, stem_cache_policy) if stem_cache_size > 0 else None
         else:
             self.stemmer = None
+            self.stem_cache = None
         
         # Load English stopwords
         if use_stopwords:
@@ -33,13 +146,14 @@ class TextPreprocessor:
             self.stopwords = set()
         
         print(f"TextPreprocessor initialized:")
-        print(f"  - Stemming: {'ON' if use_stemming else 'OFF'}")
+        print(f"  - Stemming: {'ON' if use_stemming else 'OFF'}"
+              + (f" (cache: {stem_cache_size:,} terms, {stem_cache_policy})" if self.stem_cache else ""))
         print(f"  - Stopwords: {'ON' if use_stopwords else 'OFF'} ({len(self.stopwords)} words)")
     
     def tokenize(self, text):
         # Convert to lowercase and extract alphabetic words
         # Pattern: \b[a-z]+\b matches word boundaries with alphabetic chars
-        tokens = re.findall(r'\b[a-z]+\b', text.lower())
+        tokens = TOKEN_PATTERN.findall(text.lower())
         
         # Filter out single-character tokens (optional, but common in IR)
         tokens = [token for token in tokens if len(token) > 1]
@@ -50,12 +164,43 @@ class TextPreprocessor:
         
         return [token for token in tokens if token not in self.stopwords]
     
-    def stem_tokens(self, tokens):
+    def stem(self, token):
+        
+        if self.stem_cache is None:
+            return self.stemmer.stem(token)
         
-        return [self.stemmer.stem(token) for token in tokens]
+        stem = self.stem_cache.get(token)
+        if stem is None:
+            stem = self.stemmer.stem(token)
+            self.stem_cache.put(token, stem)
+        return stem
+    
+    def stem_tokens(self, tokens):
+        # One cache lock per token list rather than per token
+        if self.stem_cache is None:
+            stem = self.stemmer.stem
+            return [stem(token) for token in tokens]
+        return self.stem_cache.stem_all(tokens, self.stemmer.stem)
     
     def preprocess(self, text):
-
+        # Single letters are skipped by the regex and stems are looked up
+        # per token list, so there are fewer passes and locks than in
+        # preprocess_staged. Same tokens.
+        if not text or not isinstance(text, str):
+            return []
+        
+        tokens = INDEX_TOKEN_PATTERN.findall(text.lower())
+        if self.stopwords:
+            stopwords = self.stopwords
+            tokens = [word for word in tokens if word not in stopwords]
+        
+        if self.use_stemming:
+            tokens = self.stem_tokens(tokens)
+        return tokens
+    
+    def preprocess_staged(self, text):
+        # Original pipeline with a list per stage; kept for comparison
+        
         if not text or not isinstance(text, str):
             return []
         
@@ -74,8 +219,7 @@ class TextPreprocessor:
     
     def get_term_frequencies(self, text):
 
-        tokens = self.preprocess(text)
-        return Counter(tokens)
+        return Counter(self.preprocess(text))
     
     def preprocess_batch(self, texts):
 
@@ -0,0 +1,218 @@
+import bisect
+import heapq
+
+from ranking import rank_key
+
+# Slack for upper-bound comparisons, so rounding in summed bounds never
+# prunes a document that could still tie or beat the threshold
+BOUND_EPSILON = 1e-9
+
+
+class TermCursor:
+    def __init__(self, term, postings, upper_bound, contribution, block_bound=None):
+        self.term = term
+        self.postings = postings  # PostingsList or CompressedPostingsList sorted by doc_id
+        self.upper_bound = upper_bound  # max contribution of this term to any score
+        self.contribution = contribution  # (doc_id, freq) -> partial score
+        self.block_bound = block_bound  # block number -> max contribution in that block
+        
+        # Compressed postings are decoded one block at a time
+        self.blocked = hasattr(postings, 'block_last_doc')
+        self.blocks_decoded = 0
+        if self.blocked:
+            self.block = -1
+            self.load_block(0)
+        else:
+            self.block = 0
+            self.doc_ids, self.freqs = postings.doc_ids, postings.freqs
+        self.position = 0
+    
+    def load_block(self, block):
+        self.block = block
+        self.position = 0
+        if block < self.postings.num_blocks():
+            self.doc_ids, self.freqs = self.postings.decode_block(block)
+            self.blocks_decoded += 1
+        else:
+            self.doc_ids, self.freqs = (), ()
+    
+    def current_doc(self):
+        if self.position < len(self.doc_ids):
+            return self.doc_ids[self.position]
+        return None
+    
+    def current_freq(self):
+        return self.freqs[self.position]
+    
+    def advance(self):
+        self.position += 1
+        if self.blocked and self.position == len(self.doc_ids):
+            self.load_block(self.block + 1)
+    
+    def block_of(self, doc_id):
+        # Block that would hold doc_id, found from the skip list alone
+        if self.block < self.postings.num_blocks() and doc_id <= self.postings.block_last_doc[self.block]:
+            return self.block
+        return bisect.bisect_left(self.postings.block_last_doc, doc_id, lo=max(self.block, 0))
+    
+    def block_upper_bound(self, doc_id):
+        # Tightest bound on this term's contribution to doc_id without decoding
+        if not self.blocked or self.block_bound is None:
+            return self.upper_bound
+        block = self.block_of(doc_id)
+        if block >= self.postings.num_blocks():
+            return 0.0
+        return self.block_bound(block)
+    
+    def seek(self, doc_id):
+        # Jump to the first posting with doc_id >= target
+        if self.blocked:
+            block = self.block_of(doc_id)
+            if block != self.block:
+                self.load_block(block)
+        self.position = bisect.bisect_left(self.doc_ids, doc_id, lo=self.position)
+        if self.blocked and self.position == len(self.doc_ids) and self.doc_ids:
+            self.load_block(self.block + 1)
+
+
+def maxscore_top_k(cursors, top_k, finalize, base_score=None, base_bound=0.0, seeds=()):
+    """Exact top-k document-at-a-time evaluation with MaxScore pruning.
+
+    finalize(doc_id, matches) computes the exact score of a candidate from
+    {term: freq} (or returns None to reject it). base_score
+    gives each document's score before any term matches, bounded above by
+    base_bound. seeds are (doc_id, score) lower bounds used to start the
+    threshold early. Returns (ranked, stats).
+    """
+    stats = {
+        'postings_total': sum(len(cursor.postings) for cursor in cursors),
+        'postings_scored': 0,
+        'docs_scored': 0,
+        'blocks_total': sum(cursor.postings.num_blocks() for cursor in cursors if cursor.blocked),
+        'blocks_decoded': 0
+    }
+    
+    if top_k <= 0:
+        stats['postings_skipped'] = stats['postings_total']
+        return [], stats
+    
+    # Order lists by upper bound; prefix_bounds[i] bounds lists 0..i together
+    cursors = sorted(cursors, key=lambda cursor: cursor.upper_bound)
+    prefix_bounds = []
+    running = 0.0
+    for cursor in cursors:
+        running += cursor.upper_bound
+        prefix_bounds.append(running)
+    
+    # Min-heap of (score, -doc_id): the root is the current k-th best.
+    # Seed entries replaced by a full score are deleted lazily.
+    heap = []
+    seed_entries = {}
+    stale = set()
+    
+    def live_size():
+        return len(heap) - len(stale)
+    
+    def clean_root():
+        while heap and heap[0] in stale:
+            stale.discard(heapq.heappop(heap))
+    
+    def offer(entry):
+        clean_root()
+        if live_size() < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+            clean_root()
+    
+    for doc_id, score in seeds:
+        entry = (score, -doc_id)
+        seed_entries[doc_id] = entry
+        offer(entry)
+    
+    def first_essential(threshold):
+        # Lists before this index cannot lift a document to the threshold
+        # on their own, so they are only probed for existing candidates
+        boundary = 0
+        while (boundary < len(cursors)
+               and base_bound + prefix_bounds[boundary] + BOUND_EPSILON < threshold):
+            boundary += 1
+        return boundary
+    
+    threshold = heap[0][0] if live_size() >= top_k else float('-inf')
+    essential = first_essential(threshold)
+    
+    while True:
+        # Next candidate: smallest doc_id among the essential lists
+        candidate = None
+        for cursor in cursors[essential:]:
+            doc_id = cursor.current_doc()
+            if doc_id is not None and (candidate is None or doc_id < candidate):
+                candidate = doc_id
+        
+        if candidate is None:
+            break
+        
+        matches = {}
+        partial = 0.0
+        for cursor in cursors[essential:]:
+            if cursor.current_doc() == candidate:
+                freq = cursor.current_freq()
+                partial += cursor.contribution(candidate, freq)
+                matches[cursor.term] = freq
+                stats['postings_scored'] += 1
+                cursor.advance()
+        
+        base = base_score(candidate) if base_score else 0.0
+        bound = base + partial + (prefix_bounds[essential - 1] if essential else 0.0)
+        
+        # Probe non-essential lists, highest bound first, while the
+        # candidate can still reach the threshold. The block-level bound is
+        # checked first so hopeless blocks are never decoded.
+        for cursor in reversed(cursors[:essential]):
+            if bound + BOUND_EPSILON < threshold:
+                break
+            
+            block_bound = cursor.block_upper_bound(candidate)
+            bound += block_bound - cursor.upper_bound
+            if bound + BOUND_EPSILON < threshold:
+                break
+            
+            cursor.seek(candidate)
+            if cursor.current_doc() == candidate:
+                freq = cursor.current_freq()
+                contribution = cursor.contribution(candidate, freq)
+                matches[cursor.term] = freq
+                stats['postings_scored'] += 1
+                bound += contribution - block_bound
+            else:
+                bound -= block_bound
+        
+        if bound + BOUND_EPSILON < threshold:
+            continue
+        
+        score = finalize(candidate, matches)
+        stats['docs_scored'] += 1
+        
+        if score is None:
+            continue
+        
+        # A fully scored seed replaces its lower-bound entry; an entry below
+        # the root has already been evicted
+        seed = seed_entries.pop(candidate, None)
+        if seed is not None and heap and seed >= heap[0]:
+            stale.add(seed)
+            clean_root()
+        
+        offer((score, -candidate))
+        
+        if live_size() >= top_k and heap[0][0] > threshold:
+            threshold = heap[0][0]
+            essential = first_essential(threshold)
+    
+    stats['postings_skipped'] = stats['postings_total'] - stats['postings_scored']
+    stats['blocks_decoded'] = sum(cursor.blocks_decoded for cursor in cursors)
+    
+    ranked = sorted(((-neg_doc_id, score) for score, neg_doc_id in heap
+                     if (score, neg_doc_id) not in stale), key=rank_key)
+    return ranked, stats
@@ -0,0 +1,117 @@
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class QueryCache:
+    """Bounded LRU cache of ranked results, shared by the retrieval models.
+    
+    Keys are (index id, model, model parameters, top_k, query term
+    multiset), so raw queries that preprocess to the same terms share one
+    entry and indexes sharing a cache never see each other's results. Entries
+    remember the index version they were computed on and are dropped once
+    the index changes; ttl (seconds) and max_bytes (estimated result size)
+    are optional extra bounds.
+    """
+    
+    def __init__(self, max_entries=10000, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        
+        self.entries = OrderedDict()  # {key: (results, index version, expiry time, size)}
+        self.total_bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0  # entries dropped as stale (index changed or expired)
+        
+        # Scoring threads of one server share the cache
+        self.lock = threading.Lock()
+    
+    def __getstate__(self):
+        # The lock is not pickled; an unpickled cache gets a fresh one
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(index_id, model_name, params, top_k, query_terms):
+        # Order-insensitive term bag: the models only use term counts
+        return (index_id, model_name, params, top_k, tuple(sorted(Counter(query_terms).items())))
+    
+    @staticmethod
+    def estimate_size(key, results):
+        size = sys.getsizeof(key) + sys.getsizeof(key[-1]) + sys.getsizeof(results)
+        for term, count in key[-1]:
+            size += sys.getsizeof(term)
+        for doc_id, score in results:
+            # Result tuple and score; doc_ids are shared with the index
+            size += sys.getsizeof((doc_id, score)) + sys.getsizeof(score)
+        return size
+    
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            results, entry_version, expires, size = entry
+            if entry_version != version or (expires is not None and time.monotonic() > expires):
+                self.remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return list(results)
+    
+    def put(self, key, version, results):
+        with self.lock:
+            if self.max_entries <= 0:
+                return
+            
+            results = tuple(results)
+            size = self.estimate_size(key, results)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            
+            if key in self.entries:
+                self.remove(key)
+            
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self.entries[key] = (results, version, expires, size)
+            self.total_bytes += size
+            
+            while len(self.entries) > self.max_entries or (
+                    self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                oldest = next(iter(self.entries))
+                self.remove(oldest)
+                self.evictions += 1
+    
+    def remove(self, key):
+        results, version, expires, size = self.entries.pop(key)
+        self.total_bytes -= size
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+    
+    def print_statistics(self):
+        print(f"Query cache: {len(self.entries):,}/{self.max_entries:,} entries "
+              f"(~{self.total_bytes / 1024:.1f} KB), {self.hits:,} hits, {self.misses:,} misses, "
+              f"{self.evictions:,} evictions, {self.invalidations:,} invalidated, "
+              f"hit rate {self.hit_rate() * 100:.1f}%")
@@ -0,0 +1,22 @@
+import heapq
+
+
+def rank_key(item):
+    # Higher score first, ties broken by ascending doc_id
+    doc_id, score = item
+    return (-score, doc_id)
+
+
+def select_top_k(scores, top_k):
+    """Select the top_k (doc_id, score) pairs with a bounded heap: O(n log k)."""
+    if top_k <= 0:
+        return []
+    
+    # Accept a {doc_id: score} dict or any iterable of (doc_id, score) pairs
+    items = scores.items() if isinstance(scores, dict) else scores
+    
+    # When most candidates are kept anyway, a plain sort is cheaper
+    if hasattr(items, '__len__') and top_k * 4 >= len(items):
+        return sorted(items, key=rank_key)[:top_k]
+    
+    return heapq.nsmallest(top_k, items, key=rank_key)
@@ -0,0 +1,520 @@
+import math
+import threading
+import uuid
+from array import array
+from collections import Counter
+
+from postings import PostingsList
+
+
+class IndexSegment:
+    """Immutable piece of a segmented index: postings and raw counts for a
+    batch of documents. Collection-wide statistics live in SegmentedIndex."""
+    
+    def __init__(self, segment_id):
+        self.segment_id = segment_id
+        self.index = {}  # {term: PostingsList}
+        self.doc_lengths = {}  # {doc_id: total number of terms}
+        self.doc_freq = Counter()  # {term: number of docs in this segment}
+        self.collection_term_counts = Counter()  # {term: total count in this segment}
+        self.max_term_freqs = {}  # {term: highest count in this segment}
+        self.total_terms = 0
+    
+    @classmethod
+    def from_documents(cls, segment_id, preprocessor, documents):
+        segment = cls(segment_id)
+        
+        for doc_id, text in documents:
+            term_counts = Counter(preprocessor.preprocess(text))
+            segment.add_document(doc_id, term_counts)
+        
+        segment.finish()
+        return segment
+    
+    @classmethod
+    def from_segments(cls, segment_id, segments, deleted):
+        # Merge older segments, dropping deleted documents for good
+        segment = cls(segment_id)
+        
+        for source in segments:
+            for doc_id, doc_length in source.doc_lengths.items():
+                if doc_id not in deleted:
+                    segment.doc_lengths[doc_id] = doc_length
+                    segment.total_terms += doc_length
+            
+            for term, postings in source.index.items():
+                for doc_id, freq in postings:
+                    if doc_id in deleted:
+                        continue
+                    merged = segment.index.get(term)
+                    if merged is None:
+                        merged = segment.index[term] = PostingsList()
+                    merged.append(doc_id, freq)
+        
+        for term, postings in segment.index.items():
+            segment.collection_term_counts[term] = sum(postings.freqs)
+        
+        segment.finish()
+        return segment
+    
+    def add_document(self, doc_id, term_counts):
+        doc_length = sum(term_counts.values())
+        self.doc_lengths[doc_id] = doc_length
+        self.total_terms += doc_length
+        self.collection_term_counts.update(term_counts)
+        
+        for term, count in term_counts.items():
+            postings = self.index.get(term)
+            if postings is None:
+                postings = self.index[term] = PostingsList()
+            postings.append(doc_id, count)
+    
+    def finish(self):
+        for term, postings in self.index.items():
+            postings.sort()
+            self.doc_freq[term] = len(postings)
+            self.max_term_freqs[term] = max(postings.freqs)
+    
+    def get_doc_term_counts(self, doc_id):
+        
+        term_counts = {}
+        for term, postings in self.index.items():
+            count = postings.find(doc_id)
+            if count:
+                term_counts[term] = count
+        return term_counts
+    
+    def __len__(self):
+        return len(self.doc_lengths)
+
+
+class TieredMergePolicy:
+    """Groups segments into size tiers (powers of merge_factor times
+    min_segment_size documents) and merges merge_factor segments of the same
+    tier at a time, so each document is rewritten O(log N) times."""
+    
+    def __init__(self, merge_factor=4, min_segment_size=100):
+        self.merge_factor = merge_factor
+        self.min_segment_size = min_segment_size
+    
+    def tier(self, segment):
+        size = max(len(segment), 1)
+        if size <= self.min_segment_size:
+            return 0
+        return int(math.log(size / self.min_segment_size, self.merge_factor)) + 1
+    
+    def find_merge(self, segments):
+        # Smallest tier first: merging it is cheapest and removes most segments
+        tiers = {}
+        for segment in segments:
+            tiers.setdefault(self.tier(segment), []).append(segment)
+        
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+
+class SegmentedIndex:
+    """Index made of immutable segments, with the InvertedIndex query API.
+    
+    add_documents writes each batch to fresh small segments; deletions are
+    tombstones. Queries fan out over all segments and their postings are
+    merged per term. DF, IDF and collection counts are summed over segments,
+    so VectorSpaceModel and UnigramLanguageModel score exactly as on a
+    single index. A background thread merges segments with a tiered policy;
+    merges never change what a query sees, so they run alongside queries.
+    Adds and deletes should be serialized with queries by the caller.
+    """
+    
+    def __init__(self, preprocessor, max_segment_size=1000, merge_policy=None, background_merges=True):
+        self.preprocessor = preprocessor
+        self.max_segment_size = max_segment_size
+        self.merge_policy = merge_policy or TieredMergePolicy()
+        
+        self.segments = []  # replaced as a whole, so readers can iterate a snapshot
+        self.next_segment_id = 0
+        self.doc_segments = {}  # {doc_id: IndexSegment}
+        self.deleted = set()  # tombstoned doc_ids still present in segments
+        
+        # Collection statistics over live documents in all segments
+        self.doc_lengths = {}  # {doc_id: total number of terms}
+        self.doc_freq = Counter()  # {term: number of docs containing term}
+        self.collection_term_counts = Counter()  # {term: total count in collection}
+        self.num_docs = 0
+        self.total_terms = 0
+        self.avg_doc_length = 0.0
+        self.version = 0  # bumped on every add/delete
+        self.index_id = uuid.uuid4().hex  # tells indexes apart in a shared cache
+        
+        # Cosine norms and bounds depend on every IDF; recomputed once per version
+        self.doc_norms = {}
+        self.max_normalized_weights = {}
+        self.norms_version = None
+        
+        self.lock = threading.RLock()
+        self.merge_wanted = threading.Condition(self.lock)
+        self.merges_done = 0
+        self.merging = False
+        self.closed = False
+        self.merge_thread = None
+        if background_merges:
+            self.merge_thread = threading.Thread(target=self.merge_loop, daemon=True)
+            self.merge_thread.start()
+        
+        print("Segmented Index initialized")
+    
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    
+    def add_documents(self, documents):
+        # documents: {doc_id: text} or any iterable of (doc_id, text)
+        if isinstance(documents, dict):
+            documents = documents.items()
+        
+        batch = []
+        num_added = 0
+        for doc_id, text in documents:
+            batch.append((doc_id, text))
+            if len(batch) >= self.max_segment_size:
+                num_added += self.flush(batch)
+                batch = []
+        if batch:
+            num_added += self.flush(batch)
+        
+        print(f"✓ Added {num_added:,} documents ({self.num_docs:,} indexed in {len(self.segments)} segments)")
+    
+    def flush(self, batch):
+        # Tokenization happens outside the lock; only registration is serialized
+        with self.lock:
+            self.check_new_ids(batch)
+            segment_id = self.next_segment_id
+            self.next_segment_id += 1
+        segment = IndexSegment.from_documents(segment_id, self.preprocessor, batch)
+        
+        with self.lock:
+            # Another writer may have added one of these ids meanwhile
+            self.check_new_ids(batch)
+            
+            # An id reused after deletion: its old postings must not resurface
+            reused = [doc_id for doc_id in segment.doc_lengths if doc_id in self.deleted]
+            if reused:
+                self.purge(reused)
+            
+            for doc_id in segment.doc_lengths:
+                self.doc_segments[doc_id] = segment
+            self.doc_lengths.update(segment.doc_lengths)
+            self.doc_freq.update(segment.doc_freq)
+            self.collection_term_counts.update(segment.collection_term_counts)
+            self.total_terms += segment.total_terms
+            self.segments = self.segments + [segment]
+            self.update_collection_statistics()
+        
+        return len(segment)
+    
+    def check_new_ids(self, batch):
+        # Every id new to the index and unique within the batch
+        seen = set()
+        for doc_id, _ in batch:
+            if doc_id in self.doc_lengths:
+                raise ValueError(f"Document {doc_id} is already indexed")
+            if doc_id in seen:
+                raise ValueError(f"Document {doc_id} appears twice in the batch")
+            seen.add(doc_id)
+    
+    def delete_documents(self, doc_ids):
+        with self.lock:
+            # Validate the whole batch before changing anything
+            doc_ids = list(doc_ids)
+            seen = set()
+            for doc_id in doc_ids:
+                if doc_id not in self.doc_lengths:
+                    raise ValueError(f"Document {doc_id} is not indexed")
+                if doc_id in seen:
+                    raise ValueError(f"Document {doc_id} appears twice in the batch")
+                seen.add(doc_id)
+            
+            num_deleted = 0
+            for doc_id in doc_ids:
+                for term, count in self.doc_segments[doc_id].get_doc_term_counts(doc_id).items():
+                    self.doc_freq[term] -= 1
+                    if self.doc_freq[term] <= 0:
+                        del self.doc_freq[term]
+                    self.collection_term_counts[term] -= count
+                    if self.collection_term_counts[term] <= 0:
+                        del self.collection_term_counts[term]
+                
+                self.total_terms -= self.doc_lengths.pop(doc_id)
+                self.deleted.add(doc_id)
+                num_deleted += 1
+            
+            self.update_collection_statistics()
+        
+        print(f"✓ Deleted {num_deleted:,} documents ({self.num_docs:,} indexed)")
+    
+    def update_collection_statistics(self):
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = self.total_terms / self.num_docs if self.num_docs > 0 else 0
+        self.version += 1
+        # Wakes the merge thread for new segments and fresh norms
+        self.merge_wanted.notify()
+    
+    def purge(self, doc_ids):
+        # Rewrite the segments holding these tombstoned documents without them
+        doc_ids = set(doc_ids)
+        affected = {self.doc_segments[doc_id] for doc_id in doc_ids}
+        for segment in affected:
+            self.replace_segments([segment], doc_ids)
+    
+    # ------------------------------------------------------------------
+    # Merging
+    # ------------------------------------------------------------------
+    
+    def merge_loop(self):
+        while True:
+            with self.lock:
+                while (not self.closed and self.norms_version == self.version
+                       and self.merge_policy.find_merge(self.segments) is None):
+                    self.merge_wanted.wait()
+                if self.closed:
+                    return
+                
+                # Norms for the new version are ready before the next query
+                # asks for them, instead of being rebuilt inside it
+                if self.norms_version != self.version:
+                    self.refresh_norms()
+                    continue
+                self.merging = True
+            
+            try:
+                self.maybe_merge()
+            finally:
+                with self.lock:
+                    self.merging = False
+                    self.merge_wanted.notify_all()
+    
+    def maybe_merge(self):
+        # Returns True if a merge was done. The merged segment is built
+        # without holding the lock, so queries and writes continue meanwhile.
+        with self.lock:
+            group = self.merge_policy.find_merge(self.segments)
+            if group is None:
+                return False
+            segment_id = self.next_segment_id
+            self.next_segment_id += 1
+            deleted = set(self.deleted)
+        
+        merged = IndexSegment.from_segments(segment_id, group, deleted)
+        
+        with self.lock:
+            # A purge may have rewritten one of the inputs meanwhile
+            if all(segment in self.segments for segment in group):
+                self.install_merge(group, merged, deleted)
+                self.merges_done += 1
+        return True
+    
+    def replace_segments(self, group, deleted):
+        # Synchronous rewrite, used for purges under the lock
+        merged = IndexSegment.from_segments(self.next_segment_id, group, deleted)
+        self.next_segment_id += 1
+        self.install_merge(group, merged, deleted)
+    
+    def install_merge(self, group, merged, purged):
+        # The merged segment replaces the group at the position of its
+        # first member, keeping segments in insertion order
+        group_ids = {segment.segment_id for segment in group}
+        segments = []
+        for segment in self.segments:
+            if segment.segment_id not in group_ids:
+                segments.append(segment)
+            elif segment is group[0]:
+                segments.append(merged)
+        
+        for doc_id in merged.doc_lengths:
+            self.doc_segments[doc_id] = merged
+        for segment in group:
+            for doc_id in segment.doc_lengths:
+                if doc_id in purged and self.doc_segments.get(doc_id) is segment:
+                    del self.doc_segments[doc_id]
+                    self.deleted.discard(doc_id)
+        
+        self.segments = segments
+    
+    def merge_all(self):
+        # Merge everything into one segment (e.g. before a read-heavy phase)
+        with self.lock:
+            self.wait_for_merges()
+            if len(self.segments) > 1 or self.deleted:
+                self.replace_segments(list(self.segments), set(self.deleted))
+    
+    def wait_for_merges(self):
+        # Block until the background thread has nothing left to merge
+        with self.lock:
+            if self.merge_thread is None:
+                while self.maybe_merge():
+                    pass
+                return
+            while self.merging or self.merge_policy.find_merge(self.segments) is not None:
+                self.merge_wanted.wait()
+    
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.merge_wanted.notify_all()
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+    
+    # ------------------------------------------------------------------
+    # Reads (same API as InvertedIndex)
+    # ------------------------------------------------------------------
+    
+    @property
+    def vocabulary(self):
+        return self.doc_freq.keys()
+    
+    def get_postings(self, term):
+        # Fan out over a snapshot of the segments and merge in doc_id order
+        segments = self.segments
+        deleted = self.deleted
+        
+        merged = PostingsList()
+        for segment in segments:
+            postings = segment.index.get(term)
+            if postings is None:
+                continue
+            for doc_id, freq in postings:
+                if doc_id not in deleted:
+                    merged.append(doc_id, freq)
+        
+        merged.sort()
+        return merged
+    
+    def get_decoded_postings(self, term):
+        # Merged postings are always a fresh in-memory list
+        return self.get_postings(term)
+    
+    def get_weighted_postings(self, term):
+        # TF-IDF weights with the collection-wide IDF
+        idf = self.get_idf(term)
+        doc_lengths = self.doc_lengths
+        for doc_id, freq in self.get_postings(term):
+            yield doc_id, (freq / doc_lengths[doc_id]) * idf
+    
+    def get_stored_weights(self, term):
+        # Weights are always derived on the fly from the global IDF
+        return None
+    
+    def get_tfidf_weights(self, term):
+        
+        return array('d', [weight for _, weight in self.get_weighted_postings(term)])
+    
+    def get_doc_freq(self, term):
+        
+        return self.doc_freq.get(term, 0)
+    
+    def get_idf(self, term):
+        
+        df = self.doc_freq.get(term, 0)
+        return math.log(self.num_docs / df) if df > 0 else 0.0
+    
+    def get_term_count_in_doc(self, term, doc_id):
+        
+        if doc_id not in self.doc_lengths:
+            return 0
+        postings = self.doc_segments[doc_id].index.get(term)
+        return postings.find(doc_id) if postings is not None else 0
+    
+    def get_doc_term_counts(self, doc_id):
+        
+        if doc_id not in self.doc_lengths:
+            return {}
+        return self.doc_segments[doc_id].get_doc_term_counts(doc_id)
+    
+    def get_doc_length(self, doc_id):
+        
+        return self.doc_lengths.get(doc_id, 0)
+    
+    def get_collection_term_count(self, term):
+        
+        return self.collection_term_counts.get(term, 0)
+    
+    def get_collection_prob(self, term):
+        
+        if self.total_terms == 0:
+            return 0.0
+        return self.collection_term_counts.get(term, 0) / self.total_terms
+    
+    def get_max_term_freq(self, term):
+        # May overestimate after deletions, which keeps it a valid bound
+        return max((segment.max_term_freqs.get(term, 0) for segment in self.segments), default=0)
+    
+    def refresh_norms(self):
+        # Straight over the segments: per-term merged postings are not needed
+        # for sums and maxima, and skipping them keeps this a single pass
+        with self.lock:
+            if self.norms_version == self.version:
+                return
+            
+            doc_lengths = self.doc_lengths
+            deleted = self.deleted
+            idf = {term: self.get_idf(term) for term in self.doc_freq}
+            
+            squared_norms = dict.fromkeys(doc_lengths, 0.0)
+            for segment in self.segments:
+                for term, postings in segment.index.items():
+                    term_idf = idf.get(term, 0.0)
+                    for doc_id, freq in postings:
+                        if doc_id not in deleted:
+                            squared_norms[doc_id] += ((freq / doc_lengths[doc_id]) * term_idf) ** 2
+            self.doc_norms = {doc_id: math.sqrt(value) for doc_id, value in squared_norms.items()}
+            
+            self.max_normalized_weights = dict.fromkeys(idf, 0.0)
+            for segment in self.segments:
+                for term, postings in segment.index.items():
+                    term_idf = idf.get(term, 0.0)
+                    best = self.max_normalized_weights.get(term, 0.0)
+                    for doc_id, freq in postings:
+                        if doc_id in deleted:
+                            continue
+                        doc_norm = self.doc_norms[doc_id]
+                        if doc_norm > 0:
+                            best = max(best, (freq / doc_lengths[doc_id]) * term_idf / doc_norm)
+                    if term in idf:
+                        self.max_normalized_weights[term] = best
+            
+            self.norms_version = self.version
+    
+    def get_doc_norm(self, doc_id):
+        
+        if self.norms_version != self.version:
+            self.refresh_norms()
+        return self.doc_norms.get(doc_id, 0.0)
+    
+    def get_max_normalized_weight(self, term):
+        
+        if self.norms_version != self.version:
+            self.refresh_norms()
+        return self.max_normalized_weights.get(term, 0.0)
+    
+    def term_exists(self, term):
+        
+        return term in self.doc_freq
+    
+    def get_documents_containing_term(self, term):
+        
+        return list(self.get_postings(term).doc_ids)
+    
+    def print_statistics(self):
+        
+        print("\n" + "=" * 70)
+        print("SEGMENTED INDEX STATISTICS")
+        print("=" * 70)
+        
+        print(f"\n  Documents:        {self.num_docs:,} ({len(self.deleted):,} tombstones)")
+        print(f"  Vocabulary size:  {len(self.doc_freq):,} unique terms")
+        print(f"  Segments:         {len(self.segments)} ({self.merges_done} merges so far)")
+        for segment in self.segments:
+            print(f"    segment {segment.segment_id:>4}: {len(segment):>7,} docs, "
+                  f"tier {self.merge_policy.tier(segment)}")
+        print("=" * 70)
@@ -0,0 +1,267 @@
+import asyncio
+import functools
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from preprocessing import TextPreprocessor
+from vsm import VectorSpaceModel
+
+# Protocol: one JSON object per line in each direction.
+#   request   {"id": 1, "model": "vsm" | "lm", "query": "...", "top_k": 10,
+#              "method": "retrieve" | "retrieve_pruned", "timeout": 2.0}
+#   response  {"id": 1, "model": "vsm", "results": [[doc_id, score], ...], "elapsed_ms": 1.2}
+#             {"id": 1, "error": "..."}
+# Requests on one connection are served concurrently; match responses by id.
+
+METHODS = ('retrieve', 'retrieve_pruned')
+
+# Models of the pool a scoring process belongs to, set by init_worker
+worker_models = None
+
+
+def init_worker(models):
+    # Runs in each forked worker; initargs of a fork pool are inherited,
+    # never pickled
+    global worker_models
+    worker_models = models
+
+
+def score_with(models, model_name, method, query_text, top_k):
+    model = models[model_name]
+    return getattr(model, method)(query_text, top_k=top_k)
+
+
+def score_request(model_name, method, query_text, top_k):
+    # In a scoring process: the models its own pool was started with
+    return score_with(worker_models, model_name, method, query_text, top_k)
+
+
+class QueryServer:
+    """Long-running asyncio front end over one loaded index.
+    
+    The index is loaded once; scoring runs in an executor so the event loop
+    keeps accepting clients and reading requests while queries are scored.
+    With executor='process' the models are shared with forked workers
+    (for a loaded index, through the same mmap); 'thread' avoids the
+    processes but scores one query at a time under the GIL. Each server
+    scores with its own models, so several can share a process.
+    """
+    
+    def __init__(self, index, mu=2000, workers=4, executor='process', default_timeout=5.0, max_top_k=1000,
+                 max_line_bytes=64 * 1024):
+        self.index = index
+        self.models = {
+            'vsm': VectorSpaceModel(index),
+            'lm': UnigramLanguageModel(index, mu=mu)
+        }
+        self.default_timeout = default_timeout
+        self.max_top_k = max_top_k
+        self.max_line_bytes = max_line_bytes  # longer request lines get an error response
+        
+        # Served / failed / timed-out request counters
+        self.stats = {'requests': 0, 'errors': 0, 'timeouts': 0}
+        
+        if executor == 'process' and 'fork' in multiprocessing.get_all_start_methods():
+            self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=multiprocessing.get_context('fork'),
+                                                initializer=init_worker, initargs=(self.models,))
+            self.score = score_request
+        else:
+            # Threads share the models, caches included (the caches lock)
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.score = functools.partial(score_with, self.models)
+        
+        self.server = None
+        self.connections = {}  # {handler task: writer} of open client connections
+        
+        print(f"Query server initialized ({type(self.executor).__name__}, {workers} workers)")
+    
+    def parse_request(self, request):
+        model_name = request.get('model', 'vsm')
+        if model_name not in self.models:
+            raise ValueError(f"Unknown model: {model_name}")
+        
+        method = request.get('method', 'retrieve')
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        
+        query_text = request.get('query')
+        if not isinstance(query_text, str):
+            raise ValueError("Missing query text")
+        
+        top_k = request.get('top_k', 10)
+        if not isinstance(top_k, int) or not 0 < top_k <= self.max_top_k:
+            raise ValueError(f"top_k must be an integer between 1 and {self.max_top_k}")
+        
+        timeout = request.get('timeout', self.default_timeout)
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ValueError("timeout must be a positive number of seconds")
+        
+        return model_name, method, query_text, top_k, timeout
+    
+    async def handle_request(self, line):
+        # One request line -> one response dict
+        self.stats['requests'] += 1
+        request_id = None
+        
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get('id')
+            model_name, method, query_text, top_k, timeout = self.parse_request(request)
+        except ValueError as e:
+            self.stats['errors'] += 1
+            return {'id': request_id, 'error': str(e)}
+        
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, self.score, model_name, method, query_text, top_k),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            # The worker finishes the query in the background; the client
+            # gets its answer now
+            self.stats['timeouts'] += 1
+            return {'id': request_id, 'error': f"Timed out after {timeout} s"}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return {'id': request_id, 'error': f"{type(e).__name__}: {e}"}
+        
+        return {
+            'id': request_id,
+            'model': model_name,
+            'results': [[doc_id, score] for doc_id, score in results],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+    
+    async def read_line(self, reader):
+        # Next request line; b'' at end of stream, None for a line over the
+        # limit, which is skipped up to its newline
+        too_long = False
+        while True:
+            try:
+                line = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # Last line without a newline, or end of stream
+                line = e.partial
+            except asyncio.LimitOverrunError as e:
+                # Drop what is buffered; a found newline is read next time
+                await reader.readexactly(e.consumed)
+                too_long = True
+                continue
+            
+            if too_long:
+                return None
+            return line
+    
+    async def handle_client(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        write_lock = asyncio.Lock()
+        pending = set()
+        
+        async def respond(line):
+            if line is None:
+                self.stats['requests'] += 1
+                self.stats['errors'] += 1
+                response = {'id': None, 'error': f"Request line longer than {self.max_line_bytes} bytes"}
+            else:
+                response = await self.handle_request(line)
+            async with write_lock:
+                try:
+                    writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                    await writer.drain()
+                except ConnectionError:
+                    # Client went away before its answer was ready
+                    pass
+        
+        try:
+            while True:
+                line = await self.read_line(reader)
+                if line == b'':
+                    break
+                if line is not None and not line.strip():
+                    continue
+                task = asyncio.create_task(respond(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Client went away
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            self.connections.pop(asyncio.current_task(), None)
+            writer.close()
+    
+    async def start(self, host='127.0.0.1', port=8765):
+        self.server = await asyncio.start_server(self.handle_client, host, port, limit=self.max_line_bytes)
+        port = self.server.sockets[0].getsockname()[1]
+        print(f"✓ Serving {self.index.num_docs:,} documents on {host}:{port}")
+        return port
+    
+    async def serve_forever(self, host='127.0.0.1', port=8765):
+        await self.start(host, port)
+        async with self.server:
+            await self.server.serve_forever()
+    
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            
+            # Closing the connections ends each handler at its next read
+            handlers = list(self.connections)
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            
+            await self.server.wait_closed()
+            self.server = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def send_requests(requests, host='127.0.0.1', port=8765):
+    # Small client: send all requests on one connection, return responses by id
+    reader, writer = await asyncio.open_connection(host, port)
+    for request in requests:
+        writer.write((json.dumps(request) + '\n').encode('utf-8'))
+    await writer.drain()
+    
+    responses = {}
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        responses[response.get('id')] = response
+    
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def main():
+    # Usage: python server.py [index_file] [port]
+    index_file = sys.argv[1] if len(sys.argv) > 1 else "data/cranfield/cranfield.idx"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    
+    index = InvertedIndex.load(index_file, TextPreprocessor())
+    server = QueryServer(index)
+    
+    try:
+        asyncio.run(server.serve_forever(port=port))
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
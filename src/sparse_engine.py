@@ -0,0 +1,164 @@
+import math
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+
+class SparseScoringEngine:
+    """Scores whole query batches as sparse matrix products over the index.
+    
+    The index is exported once as a term x document count matrix (CSR).
+    VSM cosine and Dirichlet query likelihood for a batch of queries then
+    become one sparse product each, instead of per-query Python loops.
+    Results match VectorSpaceModel / UnigramLanguageModel up to
+    floating-point rounding.
+    """
+    
+    def __init__(self, index):
+        self.index = index
+        self.preprocessor = index.preprocessor
+        
+        # Dense ordinals for documents and terms
+        self.doc_ids = np.array(sorted(index.doc_lengths.keys()), dtype=np.int64)
+        self.doc_positions = {int(doc_id): i for i, doc_id in enumerate(self.doc_ids)}
+        self.terms = sorted(index.vocabulary)
+        self.term_positions = {term: i for i, term in enumerate(self.terms)}
+        
+        self.counts = self.build_count_matrix()
+        
+        # Per-document and per-term statistics as arrays
+        self.doc_lengths = np.array([index.get_doc_length(int(d)) for d in self.doc_ids], dtype=np.float64)
+        self.doc_norms = np.array([index.get_doc_norm(int(d)) for d in self.doc_ids], dtype=np.float64)
+        self.idf = np.array([index.get_idf(term) for term in self.terms], dtype=np.float64)
+        self.collection_probs = np.array([index.get_collection_prob(term) for term in self.terms],
+                                         dtype=np.float64)
+        
+        # TF-IDF matrix with the same weight formula as the index
+        self.tfidf = self.counts.multiply(1.0 / np.maximum(self.doc_lengths, 1)[np.newaxis, :])
+        self.tfidf = sparse.csr_matrix(self.tfidf.multiply(self.idf[:, np.newaxis]))
+        
+        # Dirichlet matched-term matrices, one per mu
+        self.dirichlet_matrices = {}
+        
+        print(f"Sparse scoring engine initialized ({len(self.terms):,} terms x {len(self.doc_ids):,} docs, "
+              f"{self.counts.nnz:,} non-zeros)")
+    
+    def build_count_matrix(self):
+        rows, cols, data = [], [], []
+        
+        for term_position, term in enumerate(self.terms):
+            for doc_id, freq in self.index.get_postings(term):
+                rows.append(term_position)
+                cols.append(self.doc_positions[doc_id])
+                data.append(freq)
+        
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), (np.array(rows), np.array(cols))),
+            shape=(len(self.terms), len(self.doc_ids))
+        )
+    
+    def dirichlet_matrix(self, mu):
+        # log(1 + c(t,d) / (mu * P(t|C))) for every non-zero count
+        if mu not in self.dirichlet_matrices:
+            matrix = self.counts.copy()
+            term_rows = np.repeat(np.arange(len(self.terms)), np.diff(matrix.indptr))
+            matrix.data = np.log1p(matrix.data / (mu * self.collection_probs[term_rows]))
+            self.dirichlet_matrices[mu] = matrix
+        return self.dirichlet_matrices[mu]
+    
+    def query_term_counts(self, queries):
+        # {query_id: Counter(preprocessed terms)}, in query order
+        return {query_id: Counter(self.preprocessor.preprocess(text))
+                for query_id, text in queries.items()}
+    
+    def top_k_rows(self, query_ids, scores, top_k, keep=None):
+        # Top-K per row of a dense score matrix, ties broken by doc_id
+        results = {}
+        
+        for row, query_id in enumerate(query_ids):
+            row_scores = scores[row]
+            candidates = np.arange(len(row_scores)) if keep is None else np.flatnonzero(keep[row])
+            
+            if len(candidates) > top_k:
+                # Keep everything tied with the k-th best, then order exactly
+                kth = np.partition(row_scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+                candidates = candidates[row_scores[candidates] >= kth]
+            
+            order = np.lexsort((self.doc_ids[candidates], -row_scores[candidates]))[:top_k]
+            results[query_id] = [(int(self.doc_ids[c]), float(row_scores[c])) for c in candidates[order]]
+        
+        return results
+    
+    def in_batches(self, queries, batch_size, score_batch):
+        # Dense score blocks are batch_size x num_docs, so memory stays bounded
+        term_counts = self.query_term_counts(queries)
+        query_ids = list(queries.keys())
+        results = {}
+        
+        for start in range(0, len(query_ids), batch_size):
+            results.update(score_batch(query_ids[start:start + batch_size], term_counts))
+        
+        return results
+    
+    def retrieve_vsm_batch(self, queries, top_k=100, batch_size=512):
+        return self.in_batches(queries, batch_size,
+                               lambda query_ids, term_counts: self.score_vsm(query_ids, term_counts, top_k))
+    
+    def retrieve_lm_batch(self, queries, mu=2000, top_k=100, batch_size=512):
+        return self.in_batches(queries, batch_size,
+                               lambda query_ids, term_counts: self.score_lm(query_ids, term_counts, mu, top_k))
+    
+    def score_vsm(self, query_ids, term_counts, top_k):
+        # Query TF-IDF weights, as in VectorSpaceModel.get_query_vector
+        rows, cols, data = [], [], []
+        for row, query_id in enumerate(query_ids):
+            query_length = sum(term_counts[query_id].values())
+            for term, freq in term_counts[query_id].items():
+                if term in self.term_positions:
+                    rows.append(row)
+                    cols.append(self.term_positions[term])
+                    data.append(freq / query_length * self.idf[self.term_positions[term]])
+        
+        query_matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(query_ids), len(self.terms)))
+        query_norms = np.sqrt(np.asarray(query_matrix.multiply(query_matrix).sum(axis=1)).ravel())
+        
+        # All dot products in one sparse product, then cosine normalization
+        dot_products = (query_matrix @ self.tfidf).toarray()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = dot_products / (query_norms[:, np.newaxis] * self.doc_norms[np.newaxis, :])
+        scores = np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        return self.top_k_rows(query_ids, scores, top_k, keep=scores > 0)
+    
+    def score_lm(self, query_ids, term_counts, mu, top_k):
+        # Query term counts for terms with non-zero collection probability
+        rows, cols, data = [], [], []
+        query_constants = np.zeros(len(query_ids))
+        num_query_terms = np.zeros(len(query_ids))
+        for row, query_id in enumerate(query_ids):
+            for term, count in term_counts[query_id].items():
+                position = self.term_positions.get(term)
+                if position is None or self.collection_probs[position] == 0:
+                    continue
+                rows.append(row)
+                cols.append(position)
+                data.append(count)
+                query_constants[row] += count * math.log(self.collection_probs[position])
+                num_query_terms[row] += count
+        
+        query_matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(query_ids), len(self.terms)))
+        
+        # log P(q|d) = constant + n * log(mu / (|d| + mu)) + matched terms
+        length_norms = np.log(mu / (self.doc_lengths + mu))
+        scores = (query_matrix @ self.dirichlet_matrix(mu)).toarray()
+        scores += query_constants[:, np.newaxis] + num_query_terms[:, np.newaxis] * length_norms[np.newaxis, :]
+        
+        # Queries without any terms get no results, as in retrieve
+        has_terms = np.array([bool(term_counts[query_id]) for query_id in query_ids])
+        results = self.top_k_rows(query_ids, scores, top_k)
+        for row, query_id in enumerate(query_ids):
+            if not has_terms[row]:
+                results[query_id] = []
+        
+        return results
@@ -0,0 +1,204 @@
+import heapq
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+
+from index_storage import IndexWriter, TERM_MAX_WEIGHT, to_disk_bytes
+from indexer import InvertedIndex
+from postings import PostingsList
+
+# Run file record: term length, postings count, UTF-8 term, doc_ids uint32[n], freqs uint32[n]
+RUN_RECORD = struct.Struct('<HI')
+
+# Rough resident cost used against the memory budget
+BYTES_PER_POSTING = 8
+BYTES_PER_TERM = 200
+
+
+def write_run(path, postings):
+    # Terms in sorted order, so runs can be k-way merged
+    with open(path, 'wb') as f:
+        for term in sorted(postings):
+            term_postings = postings[term]
+            encoded = term.encode('utf-8')
+            f.write(RUN_RECORD.pack(len(encoded), len(term_postings)))
+            f.write(encoded)
+            f.write(to_disk_bytes(term_postings.doc_ids))
+            f.write(to_disk_bytes(term_postings.freqs))
+
+
+def read_run(path, run_number):
+    # Yields (term, run_number, doc_ids, freqs) one term at a time
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(RUN_RECORD.size)
+            if not header:
+                return
+            term_length, count = RUN_RECORD.unpack(header)
+            term = f.read(term_length).decode('utf-8')
+            
+            doc_ids = array('I')
+            freqs = array('I')
+            doc_ids.frombytes(f.read(4 * count))
+            freqs.frombytes(f.read(4 * count))
+            if sys.byteorder == 'big':
+                doc_ids.byteswap()
+                freqs.byteswap()
+            
+            yield term, run_number, doc_ids, freqs
+
+
+class SPIMIIndexBuilder:
+    """Single-pass in-memory indexing for collections larger than RAM.
+    
+    Postings are gathered in memory until the budget is hit, then flushed as
+    a sorted run to a temporary file. The runs are k-way merged term by term
+    straight into the on-disk index format, computing document frequencies,
+    IDF, collection counts and weights during the merge. Only per-document
+    statistics and one term's postings are held in memory at merge time.
+    """
+    
+    def __init__(self, preprocessor, memory_budget=64 * 1024 * 1024, temp_dir=None):
+        self.preprocessor = preprocessor
+        self.memory_budget = memory_budget
+        self.temp_dir = temp_dir
+        
+        self.doc_lengths = {}  # {doc_id: total number of terms}
+        self.run_paths = []
+    
+    def build(self, documents, path):
+        # documents: {doc_id: text} or any iterable of (doc_id, text)
+        print("\n" + "=" * 70)
+        print("BUILDING INVERTED INDEX (SPIMI)")
+        print("=" * 70)
+        
+        if isinstance(documents, dict):
+            documents = documents.items()
+        
+        # Per-build state, so a builder can be reused
+        self.doc_lengths = {}
+        self.run_paths = []
+        
+        run_dir = tempfile.mkdtemp(prefix='spimi-', dir=self.temp_dir)
+        try:
+            print(f"\nStep 1: Indexing documents in runs of at most "
+                  f"{self.memory_budget / 1024 / 1024:.1f} MB...")
+            
+            self.invert(documents, run_dir)
+            
+            print(f"Step 2: Merging {len(self.run_paths)} runs into {path}...")
+            
+            self.merge(path)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        
+        if getattr(self.preprocessor, 'stem_cache', None) is not None:
+            self.preprocessor.stem_cache.save(path + '.stems')
+        
+        print("\n✓ Index built successfully!")
+        print("=" * 70)
+        
+        return InvertedIndex.load(path, self.preprocessor)
+    
+    def invert(self, documents, run_dir):
+        postings = {}
+        used = 0
+        
+        for doc_id, text in documents:
+            term_counts = Counter(self.preprocessor.preprocess(text))
+            self.doc_lengths[doc_id] = sum(term_counts.values())
+            
+            for term, count in term_counts.items():
+                term_postings = postings.get(term)
+                if term_postings is None:
+                    term_postings = postings[term] = PostingsList()
+                    used += BYTES_PER_TERM
+                term_postings.append(doc_id, count)
+                used += BYTES_PER_POSTING
+            
+            if used >= self.memory_budget:
+                self.flush_run(postings, run_dir)
+                postings = {}
+                used = 0
+        
+        if postings:
+            self.flush_run(postings, run_dir)
+    
+    def flush_run(self, postings, run_dir):
+        run_path = os.path.join(run_dir, f"run{len(self.run_paths):05d}")
+        write_run(run_path, postings)
+        self.run_paths.append(run_path)
+    
+    def merged_terms(self):
+        # Every term once, in sorted order, with postings concatenated in run order
+        runs = [read_run(run_path, run_number) for run_number, run_path in enumerate(self.run_paths)]
+        current_term = None
+        current = None
+        
+        for term, _, doc_ids, freqs in heapq.merge(*runs, key=lambda record: (record[0], record[1])):
+            if term != current_term:
+                if current is not None:
+                    yield current_term, current
+                current_term = term
+                current = PostingsList()
+            current.doc_ids.extend(doc_ids)
+            current.freqs.extend(freqs)
+        
+        if current is not None:
+            yield current_term, current
+    
+    def merge(self, path):
+        num_docs = len(self.doc_lengths)
+        total_terms = sum(self.doc_lengths.values())
+        
+        writer = IndexWriter(path)
+        try:
+            self.write_terms(writer, num_docs, total_terms)
+        finally:
+            writer.close()
+    
+    def write_terms(self, writer, num_docs, total_terms):
+        squared_norms = dict.fromkeys(self.doc_lengths, 0.0)
+        
+        for term, postings in self.merged_terms():
+            # Runs follow input order; postings are stored in doc_id order
+            postings.sort()
+            
+            df = len(postings)
+            idf = math.log(num_docs / df) if df > 0 else 0.0
+            weights = array('d', [(freq / self.doc_lengths[doc_id]) * idf
+                                  for doc_id, freq in postings])
+            for doc_id, weight in zip(postings.doc_ids, weights):
+                squared_norms[doc_id] += weight ** 2
+            
+            # The cosine bound needs final norms and is filled in below
+            writer.add_term(term, postings.doc_ids, postings.freqs, weights,
+                            sum(postings.freqs), idf, max(postings.freqs, default=0), 0.0)
+        
+        doc_ids = sorted(self.doc_lengths)
+        doc_norms = {doc_id: math.sqrt(squared_norms[doc_id]) for doc_id in doc_ids}
+        
+        # Second sequential pass over the written postings for the cosine bounds
+        for term, doc_ids_on_disk, weights in writer.iter_written_terms():
+            best = 0.0
+            for doc_id, weight in zip(doc_ids_on_disk, weights):
+                doc_norm = doc_norms[doc_id]
+                if doc_norm > 0:
+                    best = max(best, weight / doc_norm)
+            writer.terms[term][TERM_MAX_WEIGHT] = best
+        
+        metadata = {
+            'total_terms': total_terms,
+            'avg_doc_length': total_terms / num_docs if num_docs > 0 else 0,
+            'use_stemming': self.preprocessor.use_stemming,
+            'use_stopwords': self.preprocessor.use_stopwords
+        }
+        writer.finish(doc_ids,
+                      [self.doc_lengths[doc_id] for doc_id in doc_ids],
+                      [doc_norms[doc_id] for doc_id in doc_ids],
+                      metadata)
@@ -1,12 +1,22 @@
 import math
 from collections import Counter
 
+from batch import retrieve_batch
+from pruning import TermCursor, maxscore_top_k
+from ranking import select_top_k
+
 
 class VectorSpaceModel:
-    def __init__(self, index):
+    def __init__(self, index, result_cache=None):
         self.index = index
         self.preprocessor = index.preprocessor
         
+        # Optional QueryCache of ranked results, consulted by retrieve
+        self.result_cache = result_cache
+        
+        # Postings scored/skipped by the last retrieve_pruned call
+        self.last_pruning_stats = None
+        
         print("Vector Space Model initialized (using shared index)")
     
     def compute_tf(self, term_freq, doc_length):
@@ -37,7 +47,7 @@ class VectorSpaceModel:
         doc_vector = {}
         
         # Get terms in this document from index
-        term_counts = self.index.doc_term_counts.get(doc_id, {})
+        term_counts = self.index.get_doc_term_counts(doc_id)
         
         # Compute TF-IDF for each term
         for term in term_counts.keys():
@@ -48,6 +58,9 @@ class VectorSpaceModel:
     def get_query_vector(self, query_text):
         # Preprocess query
         query_terms = self.preprocessor.preprocess(query_text)
+        return self.query_vector_from_terms(query_terms)
+    
+    def query_vector_from_terms(self, query_terms):
         query_term_freqs = Counter(query_terms)
         query_length = len(query_terms)
         
@@ -81,8 +94,147 @@ class VectorSpaceModel:
         
         return dot_product / (magnitude1 * magnitude2)
     
+    def cache_key(self, query_terms, top_k):
+        return self.result_cache.make_key(self.index.index_id, 'vsm', (), top_k, query_terms)
+    
     def retrieve(self, query_text, top_k=100):
+        # Preprocess query
+        query_terms = self.preprocessor.preprocess(query_text)
+        
+        if self.result_cache is None:
+            return self.retrieve_terms(query_terms, top_k)
+        
+        # Repeated queries (same term bag, same index version) come from the cache
+        key = self.cache_key(query_terms, top_k)
+        results = self.result_cache.get(key, self.index.version)
+        if results is None:
+            results = self.retrieve_terms(query_terms, top_k)
+            self.result_cache.put(key, self.index.version, results)
+        return results
+    
+    def retrieve_terms(self, query_terms, top_k=100):
         # Get query vector
+        query_vector = self.query_vector_from_terms(query_terms)
+        
+        if not query_vector:
+            return []
+        
+        query_norm = math.sqrt(sum(weight ** 2 for weight in query_vector.values()))
+        
+        if query_norm == 0:
+            return []
+        
+        # Term-at-a-time: walk only the postings of the query terms and
+        # accumulate dot products, so untouched documents cost nothing.
+        # Document TF-IDF weights come precomputed from the index.
+        accumulators = {}
+        for term, query_weight in query_vector.items():
+            for doc_id, doc_weight in self.index.get_weighted_postings(term):
+                accumulators[doc_id] = accumulators.get(doc_id, 0.0) + query_weight * doc_weight
+        
+        return self.finish_query(query_norm, accumulators, top_k)
+    
+    # Hooks for shared retrieval across models (MultiModelRetriever): the
+    # query is preprocessed and each term's postings fetched only once
+    
+    def begin_query(self, query_terms):
+        # ({term: query weight}, query norm), or None if nothing can match
+        query_vector = self.query_vector_from_terms(query_terms)
+        query_norm = math.sqrt(sum(weight ** 2 for weight in query_vector.values()))
+        
+        if not query_vector or query_norm == 0:
+            return None
+        return query_vector, query_norm
+    
+    def accumulate(self, term, query_weight, postings, accumulators):
+        weights = self.index.get_stored_weights(term)
+        if weights is not None:
+            for doc_id, doc_weight in zip(postings.doc_ids, weights):
+                accumulators[doc_id] = accumulators.get(doc_id, 0.0) + query_weight * doc_weight
+            return
+        
+        # Same weight formula as the index, so dot products are identical
+        idf = self.index.get_idf(term)
+        doc_lengths = self.index.doc_lengths
+        for doc_id, freq in postings:
+            accumulators[doc_id] = (accumulators.get(doc_id, 0.0)
+                                    + query_weight * ((freq / doc_lengths[doc_id]) * idf))
+    
+    def finish_query(self, query_norm, accumulators, top_k):
+        # Normalize dot products into cosine similarities
+        scores = {}
+        for doc_id, dot_product in accumulators.items():
+            doc_norm = self.index.get_doc_norm(doc_id)
+            
+            if doc_norm == 0:
+                continue
+            
+            similarity = dot_product / (query_norm * doc_norm)
+            
+            if similarity > 0:
+                scores[doc_id] = similarity
+        
+        # Select top-K (ties broken by doc_id)
+        return select_top_k(scores, top_k)
+    
+    def retrieve_pruned(self, query_text, top_k=100):
+        # Exact top-K with MaxScore dynamic pruning; the postings scored and
+        # skipped for the last query are kept in self.last_pruning_stats
+        self.last_pruning_stats = None
+        query_vector = self.get_query_vector(query_text)
+        
+        if not query_vector:
+            return []
+        
+        query_norm = math.sqrt(sum(weight ** 2 for weight in query_vector.values()))
+        
+        if query_norm == 0:
+            return []
+        
+        doc_lengths = self.index.doc_lengths
+        idfs = {term: self.index.get_idf(term) for term in query_vector}
+        
+        cursors = []
+        for term, query_weight in query_vector.items():
+            postings = self.index.get_postings(term)
+            idf = idfs[term]
+            scale = query_weight / query_norm
+            
+            # Same weight formula as the index, so values are identical
+            def contribution(doc_id, freq, idf=idf, scale=scale):
+                doc_norm = self.index.get_doc_norm(doc_id)
+                doc_weight = (freq / doc_lengths[doc_id]) * idf
+                return scale * doc_weight / doc_norm if doc_norm > 0 else 0.0
+            
+            block_bound = None
+            if hasattr(postings, 'block_max_weight'):
+                def block_bound(block, postings=postings, scale=scale):
+                    return scale * postings.block_max_weight[block]
+            
+            upper_bound = scale * self.index.get_max_normalized_weight(term)
+            cursors.append(TermCursor(term, postings, upper_bound, contribution, block_bound))
+        
+        def finalize(doc_id, matches):
+            doc_norm = self.index.get_doc_norm(doc_id)
+            
+            if doc_norm == 0:
+                return None
+            
+            # Same summation order as retrieve, so scores are identical
+            dot_product = 0.0
+            for term, query_weight in query_vector.items():
+                if term in matches:
+                    doc_weight = (matches[term] / doc_lengths[doc_id]) * idfs[term]
+                    dot_product += query_weight * doc_weight
+            
+            similarity = dot_product / (query_norm * doc_norm)
+            return similarity if similarity > 0 else None
+        
+        ranked_docs, self.last_pruning_stats = maxscore_top_k(cursors, top_k, finalize)
+        return ranked_docs
+    
+    def retrieve_exhaustive(self, query_text, top_k=100):
+        # Reference implementation: full cosine against every document
         query_vector = self.get_query_vector(query_text)
         
         if not query_vector:
@@ -90,16 +242,20 @@ class VectorSpaceModel:
         
         # Compute similarity with all documents
         scores = {}
-        for doc_id in self.index.documents.keys():
+        for doc_id in self.index.doc_lengths.keys():
             doc_vector = self.get_document_vector(doc_id)
             similarity = self.cosine_similarity(query_vector, doc_vector)
             
             if similarity > 0:
                 scores[doc_id] = similarity
         
-        # Sort and return top-K
-        ranked_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return ranked_docs[:top_k]
+        # Select top-K (ties broken by doc_id)
+        return select_top_k(scores, top_k)
+    
+    def retrieve_batch(self, queries, top_k=100, workers=None, method='retrieve'):
+        # {query_id: results} for {query_id: query_text}, spread over a
+        # pool of forked processes that share this model's index
+        return retrieve_batch(self, queries, top_k, workers, method)
     
     def explain_query(self, query_text, top_n=5):
         """Explain query processing."""
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Modules in src/ import each other top-level, as when run from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from preprocessing import TextPreprocessor
+
+
+WORDS = ['flow', 'boundary', 'layer', 'wing', 'pressure', 'shock', 'wave', 'heat',
+         'transfer', 'laminar', 'turbulent', 'mach', 'number', 'supersonic', 'plate',
+         'cylinder', 'vortex', 'drag', 'lift', 'jet']
+
+
+def make_documents(num_docs, seed=0):
+    # Small deterministic corpus: {doc_id: text} with skewed term counts
+    documents = {}
+    state = seed + 1
+    for doc_id in range(1, num_docs + 1):
+        words = []
+        for _ in range(5 + doc_id % 11):
+            state = (state * 1103515245 + 12345) % 2 ** 31
+            words.append(WORDS[(state >> 8) % len(WORDS) // (1 + (state >> 4) % 3)])
+        documents[doc_id] = ' '.join(words)
+    return documents
+
+
+QUERIES = ['boundary layer flow', 'supersonic shock wave', 'heat transfer plate',
+           'laminar flow wing', 'drag lift vortex']
+
+
+@pytest.fixture
+def documents():
+    return make_documents(300)
+
+
+@pytest.fixture
+def preprocessor():
+    return TextPreprocessor()
+
+
+def rankings(model, top_k=20):
+    return [model.retrieve(query, top_k=top_k) for query in QUERIES]
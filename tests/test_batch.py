@@ -0,0 +1,30 @@
+import os
+
+import batch
+from batch import MIN_QUERIES_PER_WORKER, effective_workers
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+
+
+def test_effective_workers(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    many = 100 * MIN_QUERIES_PER_WORKER
+    assert effective_workers(None, many) == 4
+    assert effective_workers(8, many) == 4
+    assert effective_workers(2, many) == 2
+    assert effective_workers(4, 2 * MIN_QUERIES_PER_WORKER) == 2
+    assert effective_workers(4, 5) == 1
+    
+    monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    assert effective_workers(4, many) == 1
+
+
+def test_parallel_batch_matches_sequential(monkeypatch, preprocessor, documents):
+    index = InvertedIndex(preprocessor, lean=True)
+    index.build_index(documents)
+    model = UnigramLanguageModel(index)
+    queries = {query_id: text for query_id, text in list(documents.items())[:4 * MIN_QUERIES_PER_WORKER]}
+    
+    expected = {query_id: model.retrieve(text, top_k=10) for query_id, text in queries.items()}
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    assert batch.retrieve_batch(model, queries, top_k=10, workers=2) == expected
@@ -0,0 +1,31 @@
+import pytest
+
+from evaluation import (calculate_err_at_k, calculate_ndcg_at_k, compute_metrics, evaluate_query,
+                        graded_ideal_dcg_prefix)
+
+JUDGMENTS = {3: 4, 8: 1, 12: 3, 20: 0, 21: 2}
+RANKING = [(doc_id, 1.0 / rank) for rank, doc_id in enumerate([8, 5, 3, 21, 40, 12, 7, 20, 9, 1], 1)]
+
+
+def test_single_pass_matches_per_metric_functions():
+    ideal_prefix = graded_ideal_dcg_prefix(JUDGMENTS)
+    metrics = evaluate_query(JUDGMENTS, RANKING, [1, 3, 5, 10, 20], graded=True, ideal_prefix=ideal_prefix)
+    for k in (1, 3, 5, 10, 20):
+        assert metrics['ndcg_at_k'][k] == calculate_ndcg_at_k(JUDGMENTS, RANKING, k, graded=True)
+        assert metrics['ndcg_at_k'][k] == calculate_ndcg_at_k(JUDGMENTS, RANKING, k, graded=True,
+                                                              ideal_prefix=ideal_prefix)
+        assert metrics['err_at_k'][k] == calculate_err_at_k(JUDGMENTS, RANKING, k, graded=True)
+        assert 0.0 <= metrics['err_at_k'][k] <= 1.0
+
+
+def test_graded_err_checks_max_grade():
+    assert calculate_err_at_k(JUDGMENTS, RANKING, 10, graded=True) == \
+        calculate_err_at_k(JUDGMENTS, RANKING, 10, max_grade=4, graded=True)
+    with pytest.raises(ValueError):
+        calculate_err_at_k(JUDGMENTS, RANKING, 10, max_grade=1, graded=True)
+    with pytest.raises(ValueError):
+        compute_metrics({1: 'q'}, {1: JUDGMENTS}, {1: RANKING}, graded=True, max_grade=3)
+    
+    # Other scales pass their own top grade
+    five_point = {doc_id: grade + 1 for doc_id, grade in JUDGMENTS.items()}
+    assert calculate_err_at_k(five_point, RANKING, 10, max_grade=5, graded=True) <= 1.0
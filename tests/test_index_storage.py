@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import rankings
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from preprocessing import TextPreprocessor
+from vsm import VectorSpaceModel
+
+
+def build(preprocessor, documents, **kwargs):
+    index = InvertedIndex(preprocessor, **kwargs)
+    index.build_index(documents)
+    return index
+
+
+def test_save_load_round_trip(tmp_path, preprocessor, documents):
+    built = build(preprocessor, documents, lean=True)
+    path = str(tmp_path / 'test.idx')
+    built.save(path)
+    
+    loaded = InvertedIndex.load(path, preprocessor)
+    try:
+        assert loaded.num_docs == built.num_docs
+        assert loaded.total_terms == built.total_terms
+        assert loaded.doc_lengths == built.doc_lengths
+        assert loaded.idf == built.idf
+        assert loaded.doc_norms == built.doc_norms
+        assert set(loaded.vocabulary) == set(built.vocabulary)
+        for term in built.vocabulary:
+            assert list(loaded.get_postings(term)) == list(built.get_postings(term))
+            assert loaded.max_normalized_weights[term] == built.max_normalized_weights[term]
+        
+        assert rankings(VectorSpaceModel(loaded)) == rankings(VectorSpaceModel(built))
+        assert rankings(UnigramLanguageModel(loaded)) == rankings(UnigramLanguageModel(built))
+    finally:
+        loaded.close()
+
+
+def test_load_rejects_other_preprocessing(tmp_path, preprocessor, documents):
+    path = str(tmp_path / 'test.idx')
+    build(preprocessor, documents, lean=True).save(path)
+    with pytest.raises(ValueError):
+        InvertedIndex.load(path, TextPreprocessor(use_stemming=False))
@@ -0,0 +1,84 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from conftest import rankings
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from postings import PostingsCache
+from preprocessing import StemCache
+from query_cache import QueryCache
+from vsm import VectorSpaceModel
+
+
+def test_incremental_updates_match_fresh_build(preprocessor, documents):
+    items = list(documents.items())
+    index = InvertedIndex(preprocessor, lean=True)
+    index.build_index(dict(items[:200]))
+    index.add_documents(dict(items[200:]))
+    index.delete_documents([doc_id for doc_id in documents if doc_id % 5 == 0])
+    
+    reference = InvertedIndex(preprocessor, lean=True)
+    reference.build_index({doc_id: text for doc_id, text in items if doc_id % 5})
+    
+    for model_class in (VectorSpaceModel, UnigramLanguageModel):
+        expected = rankings(model_class(reference))
+        actual = rankings(model_class(index))
+        assert [[doc_id for doc_id, _ in ranking] for ranking in actual] == \
+            [[doc_id for doc_id, _ in ranking] for ranking in expected]
+
+
+def test_build_keeps_caller_documents(preprocessor, documents):
+    original = dict(documents)
+    index = InvertedIndex(preprocessor)
+    index.build_index(documents)
+    index.delete_documents([1, 2])
+    index.add_documents({1000: 'flow shock'})
+    assert documents == original
+
+
+def test_invalid_batches_leave_index_unchanged(preprocessor):
+    index = InvertedIndex(preprocessor, lean=True)
+    index.build_index({1: 'flow shock', 5: 'boundary layer', 9: 'heat transfer'})
+    version = index.version
+    
+    with pytest.raises(ValueError):
+        index.add_documents([(2, 'flow flow'), (2, 'flow shock')])
+    with pytest.raises(ValueError):
+        index.add_documents([(3, 'flow wing'), (5, 'flow')])
+    with pytest.raises(ValueError):
+        index.delete_documents([1, 1])
+    with pytest.raises(ValueError):
+        index.delete_documents([9, 4])
+    
+    assert index.version == version
+    assert index.num_docs == len(index.doc_lengths) == 3
+    assert list(index.get_postings('flow')) == [(1, 1)]
+    assert index.get_term_count_in_doc('flow', 1) == 1
+    
+    index.add_documents({3: 'flow flow wing'})
+    assert list(index.get_postings('flow')) == [(1, 1), (3, 2)]
+    assert index.get_doc_freq('flow') == 2
+
+
+def test_parallel_build_with_spawned_workers(preprocessor, documents):
+    # Spawned workers receive a pickled preprocessor (stem cache included)
+    preprocessor.preprocess(' '.join(documents.values()))
+    
+    sequential = InvertedIndex(preprocessor, lean=True)
+    sequential.build_index(documents)
+    parallel = InvertedIndex(preprocessor, lean=True)
+    parallel.build_index(documents, workers=2, shard_size=50, mp_context=multiprocessing.get_context('spawn'))
+    
+    assert parallel.doc_lengths == sequential.doc_lengths
+    assert parallel.idf == sequential.idf
+    for term in sequential.vocabulary:
+        assert list(parallel.get_postings(term)) == list(sequential.get_postings(term))
+
+
+def test_caches_pickle_without_locks():
+    for cache in (StemCache(), PostingsCache(), QueryCache()):
+        copy = pickle.loads(pickle.dumps(cache))
+        with copy.lock:
+            pass
@@ -0,0 +1,54 @@
+from array import array
+
+from conftest import QUERIES, rankings
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from postings import CompressedPostingsList, PostingsList, vbyte_decode, vbyte_encode
+from vsm import VectorSpaceModel
+
+
+def test_vbyte_round_trip():
+    values = [0, 1, 127, 128, 129, 16383, 16384, 2 ** 21, 2 ** 32 - 1, 5]
+    data = bytearray([255])  # decoding starts at an offset
+    vbyte_encode(values, data)
+    
+    decoded, position = vbyte_decode(data, 1, len(values))
+    assert decoded == values
+    assert position == len(data)
+    assert len(data) == 1 + 1 + 1 + 1 + 2 + 2 + 2 + 3 + 4 + 5 + 1
+
+
+def test_compressed_postings_match_plain():
+    doc_ids = array('I', [3 + 7 * i + i % 5 for i in range(300)])
+    freqs = array('I', [1 + (i * 31) % 9 for i in range(300)])
+    plain = PostingsList(doc_ids, freqs)
+    compressed = CompressedPostingsList(plain, block_size=64)
+    
+    assert len(compressed) == len(plain)
+    assert compressed.num_blocks() == 5
+    assert list(compressed) == list(plain)
+    assert list(compressed.decode()) == list(plain)
+    assert [compressed[i] for i in (0, 63, 64, 299, -1)] == [plain[i] for i in (0, 63, 64, 299, -1)]
+    assert list(compressed[10:20]) == list(plain[10:20])
+    assert list(compressed.block_last_doc) == [doc_ids[min(i + 63, 299)] for i in range(0, 300, 64)]
+    
+    for doc_id in range(0, doc_ids[-1] + 10):
+        assert compressed.find(doc_id) == plain.find(doc_id)
+
+
+def test_compressed_index_ranks_like_plain(preprocessor, documents):
+    plain = InvertedIndex(preprocessor, lean=True)
+    plain.build_index(documents)
+    compressed = InvertedIndex(preprocessor, lean=True, compression='vbyte')
+    compressed.build_index(documents)
+    assert any(isinstance(postings, CompressedPostingsList) for postings in compressed.index.values())
+    
+    for model_class in (VectorSpaceModel, UnigramLanguageModel):
+        expected = rankings(model_class(plain))
+        model = model_class(compressed)
+        assert rankings(model) == expected
+        
+        # Block-max pruning skips blocks but must keep the exact top k
+        pruned = [model.retrieve_pruned(query, top_k=20) for query in QUERIES]
+        assert [[doc_id for doc_id, _ in ranking] for ranking in pruned] == \
+            [[doc_id for doc_id, _ in ranking] for ranking in expected]
@@ -0,0 +1,99 @@
+import pytest
+
+from conftest import rankings
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from segments import SegmentedIndex, TieredMergePolicy
+from vsm import VectorSpaceModel
+
+
+def doc_ids(ranking_list):
+    return [[doc_id for doc_id, _ in ranking] for ranking in ranking_list]
+
+
+def scores_close(actual, expected):
+    for ranking, expected_ranking in zip(actual, expected):
+        assert [score for _, score in ranking] == pytest.approx([score for _, score in expected_ranking])
+
+
+def assert_ranks_like(index, reference):
+    for model_class in (VectorSpaceModel, UnigramLanguageModel):
+        expected = rankings(model_class(reference))
+        actual = rankings(model_class(index))
+        assert doc_ids(actual) == doc_ids(expected)
+        scores_close(actual, expected)
+
+
+@pytest.mark.parametrize('background_merges', [False, True])
+def test_segments_before_and_after_merge_all(preprocessor, documents, background_merges):
+    gone = [doc_id for doc_id in documents if doc_id % 7 == 0]
+    live = {doc_id: text for doc_id, text in documents.items() if doc_id % 7}
+    reference = InvertedIndex(preprocessor, lean=True)
+    reference.build_index(live)
+    
+    index = SegmentedIndex(preprocessor, max_segment_size=20, merge_policy=TieredMergePolicy(4, 20),
+                           background_merges=background_merges)
+    try:
+        items = list(documents.items())
+        for start in range(0, len(items), 30):
+            index.add_documents(dict(items[start:start + 30]))
+        index.delete_documents(gone)
+        if not background_merges:
+            # Nothing merges until asked: many segments, deletes as tombstones
+            assert len(index.segments) == 20 and index.deleted
+        assert_ranks_like(index, reference)
+        
+        index.wait_for_merges()
+        assert_ranks_like(index, reference)
+        
+        index.merge_all()
+        assert len(index.segments) == 1 and not index.deleted
+        assert_ranks_like(index, reference)
+        
+        assert dict(index.doc_freq) == {term: df for term, df in reference.doc_freq.items() if df}
+        assert index.total_terms == reference.total_terms
+    finally:
+        index.close()
+
+
+def test_refreshed_norms_follow_writes(preprocessor, documents):
+    index = SegmentedIndex(preprocessor, max_segment_size=50)
+    try:
+        items = list(documents.items())
+        index.add_documents(dict(items[:200]))
+        index.wait_for_merges()
+        index.add_documents(dict(items[200:]))
+        index.delete_documents([1, 2, 3])
+        
+        reference = InvertedIndex(preprocessor, lean=True)
+        reference.build_index(dict(items[3:]))
+        for doc_id, norm in reference.doc_norms.items():
+            assert index.get_doc_norm(doc_id) == pytest.approx(norm)
+        for term in reference.vocabulary:
+            assert index.get_max_normalized_weight(term) == pytest.approx(reference.max_normalized_weights[term])
+    finally:
+        index.close()
+
+
+def test_invalid_batches_leave_index_unchanged(preprocessor):
+    index = SegmentedIndex(preprocessor, background_merges=False)
+    try:
+        index.add_documents({1: 'flow shock', 2: 'boundary layer', 3: 'heat transfer'})
+        version = index.version
+        
+        with pytest.raises(ValueError):
+            index.add_documents([(4, 'flow flow'), (4, 'flow shock')])
+        with pytest.raises(ValueError):
+            index.add_documents([(5, 'wing'), (2, 'flow')])
+        with pytest.raises(ValueError):
+            index.delete_documents([1, 1])
+        with pytest.raises(ValueError):
+            index.delete_documents([3, 9])
+        
+        assert index.version == version
+        assert index.num_docs == len(index.doc_lengths) == 3
+        assert not index.deleted
+        assert list(index.get_postings('flow')) == [(1, 1)]
+        assert index.get_doc_freq('flow') == 1
+    finally:
+        index.close()
@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+from indexer import InvertedIndex
+from server import QueryServer, send_requests
+
+
+def test_overlong_line_gets_error_and_connection_stays_open(preprocessor, documents):
+    index = InvertedIndex(preprocessor, lean=True)
+    index.build_index(documents)
+    
+    async def session():
+        server = QueryServer(index, workers=1, executor='thread', max_line_bytes=1024)
+        port = await server.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            long_request = {'id': 'long', 'query': 'flow ' * 1000}
+            for request in (long_request, {'id': 1, 'query': 'boundary layer flow'}):
+                writer.write((json.dumps(request) + '\n').encode('utf-8'))
+            writer.write(b'x' * 5000)  # over the limit and cut off by the close
+            await writer.drain()
+            writer.write_eof()
+            
+            responses = []
+            while line := await reader.readline():
+                responses.append(json.loads(line))
+            writer.close()
+            
+            # Other connections are unaffected
+            later = await send_requests([{'id': 2, 'query': 'shock wave'}], port=port)
+            return responses, later, dict(server.stats)
+        finally:
+            await server.stop()
+    
+    responses, later, stats = asyncio.run(session())
+    by_id = {}
+    for response in responses:
+        by_id.setdefault(response['id'], []).append(response)
+    
+    assert [response['error'] for response in by_id[None]] == ["Request line longer than 1024 bytes"] * 2
+    assert len(by_id[1][0]['results']) == 10
+    assert len(later[2]['results']) == 10
+    assert stats['errors'] == 2
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from conftest import rankings
+from indexer import InvertedIndex
+from language_model import UnigramLanguageModel
+from spimi import SPIMIIndexBuilder
+from vsm import VectorSpaceModel
+
+
+@pytest.mark.parametrize('memory_budget', [64 * 1024 * 1024, 2000])
+def test_spimi_matches_in_memory_build(tmp_path, preprocessor, documents, memory_budget):
+    expected = InvertedIndex(preprocessor, lean=True)
+    expected.build_index(documents)
+    
+    builder = SPIMIIndexBuilder(preprocessor, memory_budget=memory_budget, temp_dir=str(tmp_path))
+    index = builder.build(documents, str(tmp_path / 'spimi.idx'))
+    try:
+        if memory_budget < 64 * 1024 * 1024:
+            assert len(builder.run_paths) > 1
+        assert index.doc_lengths == expected.doc_lengths
+        assert index.total_terms == expected.total_terms
+        assert index.idf == expected.idf
+        assert set(index.vocabulary) == set(expected.vocabulary)
+        for term in expected.vocabulary:
+            assert list(index.get_postings(term)) == list(expected.get_postings(term))
+            assert index.collection_term_counts[term] == expected.collection_term_counts[term]
+        for doc_id, norm in expected.doc_norms.items():
+            assert index.doc_norms[doc_id] == pytest.approx(norm)
+        
+        for model_class in (VectorSpaceModel, UnigramLanguageModel):
+            assert [[doc_id for doc_id, _ in ranking] for ranking in rankings(model_class(index))] == \
+                [[doc_id for doc_id, _ in ranking] for ranking in rankings(model_class(expected))]
+    finally:
+        index.close()
+    
+    # Temporary runs are removed once merged
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('spimi-')]
+
+
+def test_spimi_builder_reuse(tmp_path, preprocessor, documents):
+    builder = SPIMIIndexBuilder(preprocessor, memory_budget=2000, temp_dir=str(tmp_path))
+    builder.build(documents, str(tmp_path / 'first.idx')).close()
+    
+    subset = {doc_id: text for doc_id, text in documents.items() if doc_id <= 50}
+    index = builder.build(subset, str(tmp_path / 'second.idx'))
+    try:
+        assert sorted(index.doc_lengths) == sorted(subset)
+    finally:
+        index.close()